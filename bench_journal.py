@@ -0,0 +1,148 @@
+"""
+Mide el coste de guardar las transacciones aceptadas con cada modo de durabilidad.
+
+Se comparan tres formas de persistir cada transacción aceptada por add_transaction:
+    - 'state': reescribir el archivo de estado completo (lo que se hacía antes del diario),
+    - 'sync': añadirla al diario con un fsync por transacción,
+    - 'batch': añadirla al diario y sincronizar por lotes (como mucho cada fsync_interval).
+
+Además se mide el diario por sí solo con varios hilos escribiendo a la vez, donde el modo
+'sync' agrupa en un mismo fsync las transacciones que llegan mientras se sincroniza.
+
+Uso:
+    python bench_journal.py --transactions 500 --chain-blocks 50 --threads 8
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import threading
+from time import perf_counter
+
+from blockchain import Blockchain
+from transaction import Transaction
+from wallet import Wallet
+from utility.mempool_journal import MempoolJournal, FSYNC_INTERVAL, BATCH_SIZE
+from utility.signature_schemes import SCHEMES
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary(mode, latencies, elapsed):
+    return {
+        'mode': mode,
+        'transactions_per_second': len(latencies) / elapsed,
+        'latency_p50_ms': _percentile(latencies, 0.5) * 1000,
+        'latency_p99_ms': _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_add_transaction(mode, count, chain_blocks, senders, fsync_interval, batch_size):
+    """Mide add_transaction de principio a fin en un directorio temporal."""
+    scheme = 'ed25519' if 'ed25519' in SCHEMES else 'rsa'
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.chdir(data_dir)
+        wallets = []
+        for node_id in range(senders):
+            wallet = Wallet(node_id, scheme)
+            wallet.create_keys()
+            wallets.append(wallet)
+        blockchain = Blockchain(None, 'bench', mempool_durability=mode if mode != 'state' else 'batch',
+                                fsync_interval=fsync_interval, journal_batch_size=batch_size)
+        # Cada remitente recibe recompensas de minado para tener fondos
+        for block in range(chain_blocks):
+            blockchain.public_key = wallets[block % senders].public_key
+            blockchain.mine_block()
+        signed = []
+        for position in range(count):
+            sender = wallets[position % senders]
+            recipient = wallets[(position + 1) % senders]
+            amount = 0.001
+            signed.append((recipient.public_key, sender.public_key,
+                           sender.sign_transaction(sender.public_key, recipient.public_key,
+                                                   amount), amount))
+        latencies = []
+        started = perf_counter()
+        for recipient, sender, signature, amount in signed:
+            call_started = perf_counter()
+            blockchain.add_transaction(recipient, sender, signature, amount, scheme=scheme)
+            if mode == 'state':
+                blockchain.save_data()
+            latencies.append(perf_counter() - call_started)
+        elapsed = perf_counter() - started
+        # Un segundo nodo lee los archivos sin que el primero se cierre (como tras una caída):
+        # en modo 'batch' se pierden como mucho las del último lote sin sincronizar
+        restarted = Blockchain(None, 'bench')
+        restored = len(restarted.get_open_transactions())
+        restarted.close()
+        blockchain.close()
+        os.chdir('/')
+    metrics = _summary(mode, latencies, elapsed)
+    metrics['restored_after_crash'] = restored
+    return metrics
+
+
+def bench_journal(mode, count, threads, fsync_interval, batch_size):
+    """Mide MempoolJournal.append con varios hilos escribiendo a la vez."""
+    transaction = Transaction('a' * 64, 'b' * 64, 'c' * 128, 1.0)
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.chdir(data_dir)
+        journal = MempoolJournal('bench', mode, fsync_interval, batch_size)
+        latencies = []
+        lock = threading.Lock()
+
+        def writer():
+            own = []
+            for _ in range(count // threads):
+                call_started = perf_counter()
+                journal.append(transaction)
+                own.append(perf_counter() - call_started)
+            with lock:
+                latencies.extend(own)
+
+        workers = [threading.Thread(target=writer) for _ in range(threads)]
+        started = perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        journal.flush()
+        elapsed = perf_counter() - started
+        journal.close()
+        os.chdir('/')
+    metrics = _summary(mode, latencies, elapsed)
+    metrics['fsyncs'] = journal.syncs
+    return metrics
+
+
+def _print(metrics):
+    for key, value in metrics.items():
+        print('{}: {}'.format(key, round(value, 3) if isinstance(value, float) else value))
+    print()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument('--transactions', type=int, default=500)
+    parser.add_argument('--chain-blocks', type=int, default=50)
+    parser.add_argument('--senders', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--fsync-interval', type=float, default=FSYNC_INTERVAL)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    print('# add_transaction (un hilo)')
+    for mode in ('state', 'sync', 'batch'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics = bench_add_transaction(mode, args.transactions, args.chain_blocks,
+                                            args.senders, args.fsync_interval,
+                                            args.batch_size)
+        _print(metrics)
+    print('# diario ({} hilos)'.format(args.threads))
+    for mode in ('sync', 'batch'):
+        _print(bench_journal(mode, args.transactions * 4, args.threads,
+                             args.fsync_interval, args.batch_size))
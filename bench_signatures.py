@@ -0,0 +1,88 @@
+"""
+Mide el rendimiento y el tamaño de los esquemas de firma de los monederos.
+
+Para cada esquema se mide el tiempo de generación de claves, la velocidad de firma y de
+verificación (sin caché de claves y con la caché ya cargada) y el tamaño de las claves, las firmas, las transacciones y un bloque completo en JSON.
+
+Uso:
+    python bench_signatures.py --transactions 2000 --senders 20
+"""
+
+import json
+import random
+from time import perf_counter
+
+from block import Block
+from transaction import Transaction
+from wallet import Wallet
+from utility.signature_schemes import SCHEMES, clear_key_cache
+
+
+def make_transactions(scheme, senders, count, rng):
+    """Crea monederos del esquema dado y firma con ellos transacciones aleatorias."""
+    wallets = []
+    started = perf_counter()
+    for node_id in range(senders):
+        wallet = Wallet(node_id, scheme)
+        wallet.create_keys()
+        wallets.append(wallet)
+    keygen_time = (perf_counter() - started) / senders
+    transactions = []
+    started = perf_counter()
+    for _ in range(count):
+        sender, recipient = rng.sample(wallets, 2)
+        amount = round(rng.uniform(0.01, 10), 2)
+        signature = sender.sign_transaction(sender.public_key, recipient.public_key, amount)
+        transactions.append(Transaction(
+            sender.public_key, recipient.public_key, signature, amount, scheme))
+    sign_time = perf_counter() - started
+    return transactions, keygen_time, sign_time
+
+
+def bench_scheme(scheme, senders, count, block_size, seed):
+    """Devuelve las métricas de un esquema de firma."""
+    rng = random.Random(seed)
+    transactions, keygen_time, sign_time = make_transactions(scheme, senders, count, rng)
+
+    clear_key_cache()
+    started = perf_counter()
+    cold = all(Wallet.verify_transaction(tx) for tx in transactions)
+    cold_time = perf_counter() - started
+
+    started = perf_counter()
+    warm = all(Wallet.verify_transaction(tx) for tx in transactions)
+    warm_time = perf_counter() - started
+
+    sample = transactions[0]
+    block = Block(1, '0' * 64, [tx.__dict__ for tx in transactions[:block_size]], 0, 0)
+    return {
+        'scheme': scheme,
+        'all_valid': cold and warm,
+        'keygen_ms': keygen_time * 1000,
+        'sign_per_second': count / sign_time,
+        'verify_per_second_cold': count / cold_time,
+        'verify_per_second_warm': count / warm_time,
+        'public_key_bytes': len(sample.sender),
+        'signature_bytes': len(sample.signature),
+        'transaction_json_bytes': len(json.dumps(sample.__dict__)),
+        'block_json_bytes': len(json.dumps(block.__dict__)),
+    }
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument('--transactions', type=int, default=2000)
+    parser.add_argument('--senders', type=int, default=20)
+    parser.add_argument('--block-size', type=int, default=100,
+                        help='Transacciones del bloque cuyo tamaño se mide')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scheme', action='append', choices=sorted(SCHEMES),
+                        help='Esquema a medir (se puede repetir; por defecto, todos)')
+    args = parser.parse_args()
+    for scheme in args.scheme or sorted(SCHEMES):
+        metrics = bench_scheme(scheme, args.senders, args.transactions,
+                               args.block_size, args.seed)
+        for key, value in metrics.items():
+            print('{}: {}'.format(key, round(value, 2) if isinstance(value, float) else value))
+        print()
@@ -1,6 +1,7 @@
-from time import time
+from time import time as now
 
 from utility.printable import Printable
+from utility.difficulty import INITIAL_DIFFICULTY
 
 
 class Block(Printable):
@@ -10,14 +11,48 @@ class Block(Printable):
     Atributos:
         :index: El índice de este bloque.
         :previous_hash: El hash del bloque anterior en la blockchain.
-        :timestamp: La marca de tiempo del bloque (generada automáticamente por defecto).
+        :timestamp: La marca de tiempo del bloque (la hora actual por defecto).
         :transactions: Lista de transacciones incluidas en el bloque.
         :proof: El número de Proof of Work que dio lugar a este bloque.
+        :difficulty: La dificultad de la Proof of Work del bloque.
     """
 
-    def __init__(self, index, previous_hash, transactions, proof, time=time()):
+    def __init__(self, index, previous_hash, transactions, proof, time=None,
+                 difficulty=INITIAL_DIFFICULTY):
         self.index = index
         self.previous_hash = previous_hash
-        self.timestamp = time
+        # La marca de tiempo se toma al crear cada bloque (no al importar el módulo)
+        self.timestamp = time if time is not None else now()
         self.transactions = transactions
         self.proof = proof
+        self.difficulty = difficulty
+
+
+class BlockHeader(Printable):
+    """
+    Cabecera de un bloque podado (sin el cuerpo de transacciones).
+
+    Conserva los datos necesarios para enlazar la cadena: como las transacciones ya no están,
+    guarda el hash que tenía el bloque completo (calculado y verificado cuando se aceptó).
+
+    Atributos:
+        :index: El índice de este bloque.
+        :previous_hash: El hash del bloque anterior en la blockchain.
+        :timestamp: La marca de tiempo del bloque.
+        :proof: El número de Proof of Work que dio lugar a este bloque.
+        :block_hash: El hash del bloque completo.
+        :difficulty: La dificultad de la Proof of Work del bloque.
+        :transactions: Siempre vacía (el cuerpo se ha podado).
+        :pruned: Siempre True.
+    """
+
+    def __init__(self, index, previous_hash, timestamp, proof, block_hash,
+                 difficulty=INITIAL_DIFFICULTY):
+        self.index = index
+        self.previous_hash = previous_hash
+        self.timestamp = timestamp
+        self.proof = proof
+        self.block_hash = block_hash
+        self.difficulty = difficulty
+        self.transactions = []
+        self.pruned = True
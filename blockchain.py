@@ -2,18 +2,48 @@ from functools import reduce
 import hashlib as hl
 
 import json
+import os
 import pickle
+import random
+import threading
 import requests
 
 # Importa dos funciones desde el archivo hash_util.py
-from utility.hash_util import hash_block
+from utility.hash_util import hash_block, hash_transaction
 from utility.verification import Verification
-from block import Block
+from utility.transport import HttpTransport
+from utility.peers import PeerTable, MAX_BACKOFF
+from utility.seen_cache import SeenCache
+from utility.compact_block import compact_block, compact_block_id, short_id
+from utility.address_index import AddressIndex
+from utility.ledger_columns import LedgerColumns
+from utility.snapshot import (build_snapshot, verify_snapshot, save_snapshot, load_snapshot,
+                               remove_snapshot)
+from utility.signature_schemes import DEFAULT_SCHEME
+from utility.difficulty import DifficultyPolicy, MAX_FUTURE_BLOCK_TIME, chain_work
+from utility.mempool_journal import MempoolJournal, FSYNC_INTERVAL, BATCH_SIZE
+from block import Block, BlockHeader
 from transaction import Transaction
 from wallet import Wallet
 
 # La recompensa que se le da a los mineros (por crear un nuevo bloque)
 MINING_REWARD = 10
+# Tiempo máximo (en segundos) que se espera la respuesta de un nodo homólogo
+PEER_TIMEOUT = 5
+# Modos de propagación: 'direct' (el origen envía a todos sus homólogos) o
+# 'gossip' (cada nodo reenvía a unos pocos homólogos elegidos al azar)
+PROPAGATION_MODES = ('direct', 'gossip')
+# Número de homólogos a los que se reenvía cada mensaje en modo gossip
+GOSSIP_FANOUT = 3
+# Número máximo de saltos que recorre un mensaje en modo gossip
+GOSSIP_MAX_HOPS = 6
+# Número de identificadores de mensajes ya vistos que se recuerdan
+SEEN_CACHE_SIZE = 10000
+# Cada cuántos bloques se guarda una instantánea de los saldos
+SNAPSHOT_INTERVAL = 100
+# Espera inicial (en segundos) antes de reintentar la verificación del historial cuando
+# ningún nodo homólogo puede servirlo (se duplica en cada intento, hasta MAX_BACKOFF)
+HISTORY_RETRY_INTERVAL = 30.0
 
 print(__name__)
 
@@ -27,9 +57,20 @@ class Blockchain:
         :chain: La lista de bloques
         :open_transactions (private): La lista de transacciones abiertas
         :hosting_node: El nodo conectado (que ejecuta la copia local de la blockchain).
+        :transport: El transporte utilizado para comunicarse con los nodos homólogos.
+        :propagation: El modo de propagación de transacciones y bloques ('direct' o 'gossip').
+        :address: La URL (host:puerto) con la que los homólogos contactan con este nodo.
+        :prune_depth: Si se indica, número de bloques recientes que conservan sus transacciones
+                      (los más antiguos se reducen a su cabecera).
+        :difficulty_policy: La regla de ajuste de la dificultad de la Proof of Work.
+        :mempool_durability: Cómo se guardan las transacciones aceptadas en el diario: 'sync'
+                             (fsync por transacción) o 'batch' (por lotes, como mucho cada
+                             fsync_interval segundos o journal_batch_size transacciones).
     """
 
-    def __init__(self, public_key, node_id):
+    def __init__(self, public_key, node_id, transport=None, propagation='direct', address=None,
+                 prune_depth=None, difficulty_policy=None, mempool_durability='batch',
+                 fsync_interval=FSYNC_INTERVAL, journal_batch_size=BATCH_SIZE):
         """El constructor de la clase Blockchain."""
         # Bloque inicial para la blockchain
         genesis_block = Block(0, '', [], 100, 0)
@@ -38,10 +79,50 @@ class Blockchain:
         # Transacciones no tramitadas
         self.__open_transactions = []
         self.public_key = public_key
-        self.__peer_nodes = set()
+        self.transport = transport if transport is not None else HttpTransport()
+        self.__peer_nodes = PeerTable(self.transport.now)
         self.node_id = node_id
+        self.address = address if address is not None else 'localhost:{}'.format(node_id)
         self.resolve_conflicts = False
+        if propagation not in PROPAGATION_MODES:
+            raise ValueError('Unknown propagation mode: {}'.format(propagation))
+        self.propagation = propagation
+        self.gossip_fanout = GOSSIP_FANOUT
+        self.gossip_max_hops = GOSSIP_MAX_HOPS
+        # Hashes de las transacciones y bloques ya procesados (para descartar duplicados)
+        self.__seen = SeenCache(SEEN_CACHE_SIZE)
+        # Observadores que se notifican cuando se aplican o deshacen bloques
+        self.__observers = []
+        # Instantánea con la que empieza la cadena local (None si empieza en el génesis)
+        self.__base_snapshot = None
+        # Si el historial sobre el que se construye la cadena está verificado: True si el nodo
+        # ha comprobado él mismo todos los bloques, None mientras se verifica en segundo plano
+        # el historial anterior a la instantánea de un homólogo y False si no coincidía con ella
+        self.history_verified = True
+        self.prune_depth = prune_depth
+        self.difficulty_policy = (difficulty_policy if difficulty_policy is not None
+                                  else DifficultyPolicy())
+        # Versión del estado: aumenta con cada cambio en la cadena, las transacciones abiertas
+        # o los nodos homólogos (la usa la caché de respuestas de node.py)
+        self.state_version = 0
+        # Índice del último bloque reducido a su cabecera (None si no se ha podado ninguno)
+        self.pruned_height = None
+        # Diario de las transacciones aceptadas desde el último guardado completo del estado
+        self.__journal = MempoolJournal(node_id, mempool_durability, fsync_interval,
+                                        journal_batch_size)
         self.load_data()
+        # Índice de las transacciones por dirección (remitente y destinatario)
+        self.address_index = AddressIndex()
+        self.add_observer(self.address_index)
+        # Columnas de las transacciones confirmadas para los análisis masivos
+        self.ledger = LedgerColumns()
+        if self.__base_snapshot is not None:
+            self.ledger.set_base_balances(self.__base_snapshot['balances'])
+        self.add_observer(self.ledger)
+        # Si el nodo se detuvo antes de terminar la verificación del historial, se reanuda
+        if self.__base_snapshot is not None and self.history_verified is None:
+            threading.Thread(target=self.__verify_history_until_done,
+                             args=(None,), daemon=True).start()
 
     # Convertir el atributo chain en una propiedad con un getter (el método de abajo)
     # y un setter (@chain.setter)
@@ -54,6 +135,121 @@ class Blockchain:
     def chain(self, val):
         self.__chain = val
 
+    def add_observer(self, observer, replay=True):
+        """
+        Registra un observador de la cadena. El observador puede implementar cualquiera de
+        estos métodos, que se llaman cuando ocurre el evento correspondiente:
+            :block_applied(block): se ha añadido un bloque al final de la cadena.
+            :block_undone(block): se ha retirado el último bloque de la cadena (reorganización).
+            :chain_reorganized(fork_index, undone, applied): ha terminado una reorganización.
+            :transaction_added(transaction): se ha añadido una transacción abierta.
+            :transactions_removed(transactions): han salido transacciones abiertas (se han
+                                                 confirmado en un bloque o ya no son válidas).
+            :peers_changed(peers): ha cambiado la lista de nodos homólogos.
+
+        Argumentos:
+            :observer: El observador.
+            :replay: Si se deben notificar al observador los bloques que ya están en la cadena.
+        """
+        self.__observers.append(observer)
+        if replay and hasattr(observer, 'block_applied'):
+            for block in self.__ledger_blocks():
+                observer.block_applied(block)
+
+    def remove_observer(self, observer):
+        """Elimina un observador de la cadena."""
+        self.__observers.remove(observer)
+
+    def __ledger_blocks(self):
+        """
+        Devuelve los bloques cuyas transacciones cuentan para los saldos: todos, salvo el
+        bloque inicial cuando la cadena empieza en una instantánea (sus transacciones ya
+        están incluidas en los saldos de la instantánea).
+        """
+        if self.__base_snapshot is not None:
+            return self.__chain[self.__base_snapshot['height'] - self.__chain[0].index + 1:]
+        return self.__chain
+
+    def __notify(self, event, *args):
+        for observer in self.__observers:
+            handler = getattr(observer, event, None)
+            if handler is not None:
+                handler(*args)
+
+    def __apply_block(self, block):
+        """Añade un bloque al final de la cadena y avisa a los observadores."""
+        self.__chain.append(block)
+        self.__notify('block_applied', block)
+        if block.index % SNAPSHOT_INTERVAL == 0:
+            save_snapshot(self.create_snapshot(), self.node_id)
+
+    def __undo_block(self):
+        """Retira el último bloque de la cadena y avisa a los observadores."""
+        block = self.__chain.pop()
+        self.__notify('block_undone', block)
+        return block
+
+    def __remove_confirmed(self, transactions):
+        """Retira de las transacciones abiertas las que se han incluido en un bloque."""
+        confirmed = set(hash_transaction(tx) for tx in transactions)
+        self.__set_open_transactions([tx for tx in self.__open_transactions
+                                      if hash_transaction(tx) not in confirmed])
+
+    def __set_open_transactions(self, transactions):
+        """
+        Sustituye las transacciones abiertas y avisa a los observadores de las que salen y de
+        las que entran.
+        """
+        previous = set(hash_transaction(tx) for tx in self.__open_transactions)
+        current = set(hash_transaction(tx) for tx in transactions)
+        removed = [tx for tx in self.__open_transactions
+                   if hash_transaction(tx) not in current]
+        self.__open_transactions = transactions
+        if removed:
+            self.__notify('transactions_removed', removed)
+        for tx in transactions:
+            if hash_transaction(tx) not in previous:
+                self.__notify('transaction_added', tx)
+
+    def get_block(self, index):
+        """
+        Devuelve el bloque con el índice dado o None si no está en la cadena local.
+
+        Argumentos:
+            :index: El índice del bloque.
+        """
+        position = index - self.__chain[0].index
+        if position < 0 or position >= len(self.__chain):
+            return None
+        return self.__chain[position]
+
+    def get_history(self, address, page=1, page_size=20, from_height=None, to_height=None,
+                    since=None, until=None):
+        """
+        Devuelve una página del historial de transacciones confirmadas de una dirección
+        (de la más reciente a la más antigua) y el número total de transacciones.
+
+        Argumentos:
+            :address: La dirección (clave pública) del participante.
+            :page: El número de página (empezando en 1).
+            :page_size: El número de transacciones por página.
+            :from_height: Altura mínima del bloque (opcional).
+            :to_height: Altura máxima del bloque (opcional).
+            :since: Marca de tiempo mínima del bloque (opcional).
+            :until: Marca de tiempo máxima del bloque (opcional).
+        """
+        entries, total = self.address_index.lookup(
+            address, page, page_size, from_height, to_height, since, until)
+        history = []
+        for block_index, position in entries:
+            block = self.get_block(block_index)
+            entry = block.transactions[position].__dict__.copy()
+            entry['block_index'] = block_index
+            entry['position'] = position
+            entry['timestamp'] = block.timestamp
+            history.append(entry)
+        return history, total
+
     def get_open_transactions(self):
         """
         Devuelve una copia de la lista de transacciones abiertas.
@@ -68,34 +264,56 @@ class Blockchain:
                 ## Cargamos la blockchain ##
                 blockchain = json.loads(file_content[0][:-1])
                 # Necesitamos convertir los datos cargados porque Transactions debe utilizar OrderedDict
-                updated_blockchain = []
-                for block in blockchain:
-                    converted_tx = [Transaction(
-                        tx['sender'], tx['recipient'], tx['signature'], tx['amount']) for tx in block['transactions']]
-                    updated_block = Block(
-                        block['index'], block['previous_hash'], converted_tx, block['proof'], block['timestamp'])
-                    updated_blockchain.append(updated_block)
-                self.chain = updated_blockchain
+                self.chain = self.__to_blocks(blockchain)
+                pruned = [block.index for block in self.__chain
+                          if getattr(block, 'pruned', False)]
+                self.pruned_height = pruned[-1] if pruned else None
                 ## Cargamos las transacciones abiertas ##
                 open_transactions = json.loads(file_content[1][:-1])
                 # De nuevo necesitamos convertir los datos cargados porque Transactions debe utilizar OrderedDict
                 updated_transactions = []
                 for tx in open_transactions:
-                    updated_transaction = Transaction(
-                        tx['sender'], tx['recipient'], tx['signature'], tx['amount'])
+                    updated_transaction = Transaction.from_dict(tx)
                     updated_transactions.append(updated_transaction)
                 self.__open_transactions = updated_transactions
                 peer_nodes = json.loads(file_content[2])
-                self.__peer_nodes = set(peer_nodes)
+                for node in peer_nodes:
+                    self.__peer_nodes.add(node)
+                ## Cargamos la instantánea con la que empieza la cadena (si la hay) ##
+                if len(file_content) > 3:
+                    self.__base_snapshot = json.loads(file_content[3])
+                ## Cargamos el resultado de la verificación del historial ##
+                if len(file_content) > 4:
+                    self.history_verified = json.loads(file_content[4])
+                elif self.__base_snapshot is not None:
+                    self.history_verified = None
+                ## Cargamos la generación del diario que cubre el archivo de estado ##
+                if len(file_content) > 5:
+                    self.__journal.generation = json.loads(file_content[5])
         except (IOError, IndexError):
             pass
         finally:
+            self.__replay_journal()
             print('Datos de la blockchain y transacciones abiertas cargados!')
 
+    def __replay_journal(self):
+        """
+        Vuelve a añadir a las transacciones abiertas las del diario (las aceptadas después del
+        último guardado completo). Se descartan las de generaciones anteriores, que ya están en
+        el archivo de estado o en un bloque (quedan en el diario si el nodo cayó justo después
+        de guardar el estado).
+        """
+        for tx in self.__journal.replay():
+            if tx.get('generation', 0) >= self.__journal.generation:
+                self.__open_transactions.append(Transaction.from_dict(tx))
+
     def save_data(self):
         """Guardar estado actual de la blockchain y transacciones abiertas en un archivo."""
+        # Todos los cambios de estado terminan guardándose: las respuestas cacheadas caducan
+        self.state_version += 1
         try:
             with open('blockchain-{}.txt'.format(self.node_id), mode='w') as f:
+                # Las cabeceras de los bloques podados se guardan tal cual
                 saveable_chain = [
                     block.__dict__ for block in
                     [
@@ -103,7 +321,10 @@ class Blockchain:
                               block_el.previous_hash,
                               [tx.__dict__ for tx in block_el.transactions],
                               block_el.proof,
-                              block_el.timestamp) for block_el in self.__chain
+                              block_el.timestamp,
+                              block_el.difficulty)
+                        if not getattr(block_el, 'pruned', False) else block_el
+                        for block_el in self.__chain
                     ]
                 ]
                 f.write(json.dumps(saveable_chain))
@@ -113,20 +334,40 @@ class Blockchain:
                 f.write(json.dumps(saveable_tx))
                 f.write('\n')
                 # Almacena la lista de nodos homólogos
-                f.write(json.dumps(list(self.__peer_nodes)))
+                f.write(json.dumps(self.__peer_nodes.addresses()))
+                # Almacena la instantánea con la que empieza la cadena (None si es el génesis)
+                f.write('\n')
+                f.write(json.dumps(self.__base_snapshot))
+                # Almacena el resultado de la verificación del historial
+                f.write('\n')
+                f.write(json.dumps(self.history_verified))
+                # Almacena la generación del diario que empieza tras este guardado: las entradas
+                # de las anteriores ya están en este archivo
+                f.write('\n')
+                f.write(json.dumps(self.__journal.generation + 1))
+                # Las transacciones abiertas deben estar en el disco antes de vaciar el diario
+                f.flush()
+                os.fsync(f.fileno())
+            self.__journal.reset()
         except IOError:
             print('Fallo al guardar!')
 
-    def proof_of_work(self):
+    def proof_of_work(self, difficulty=None):
         """
         Generar una Proof of Work para las transacciones abiertas, el hash del bloque anterior
         y un número aleatorio (que se obtiene de forma aleatoria hasta que se ajuste).
+
+        Argumentos:
+            :difficulty: La dificultad del bloque (por defecto, la que le toca al siguiente).
         """
+        if difficulty is None:
+            difficulty = self.difficulty_policy.next_difficulty(self.__chain)
         last_block = self.__chain[-1]
         last_hash = hash_block(last_block)
         proof = 0
         # Prueba con diferentes números PoW y devuelve el primero válido
-        while not Verification.valid_proof(self.__open_transactions, last_hash, proof):
+        while not Verification.valid_proof(self.__open_transactions, last_hash, proof,
+                                           difficulty):
             proof += 1
         return proof
 
@@ -144,7 +385,7 @@ class Blockchain:
         # Esto recupera las cantidades enviadas de transacciones que ya estaban incluidas
         # en bloques de la blockchain
         tx_sender = [[tx.amount for tx in block.transactions
-                      if tx.sender == participant] for block in self.__chain]
+                      if tx.sender == participant] for block in self.__ledger_blocks()]
         # Obtiene una lista de todos los importes enviados por la persona dada
         # (se devuelven listas vacías si la persona NO era el remitente)
         # Esto recupera los importes enviados de las transacciones abiertas (para evitar
@@ -160,9 +401,12 @@ class Blockchain:
         # Se ignoran aquí las transacciones abiertas porque no deberías poder gastar
         # monedas antes de que la transacción haya sido confirmada + incluida en un bloque
         tx_recipient = [[tx.amount for tx in block.transactions
-                         if tx.recipient == participant] for block in self.__chain]
+                         if tx.recipient == participant] for block in self.__ledger_blocks()]
         amount_received = reduce(lambda tx_sum, tx_amt: tx_sum + sum(tx_amt)
                                  if len(tx_amt) > 0 else tx_sum + 0, tx_recipient, 0)
+        # Si la cadena empieza en una instantánea, se parte del saldo que había en ella
+        if self.__base_snapshot is not None:
+            amount_received += self.__base_snapshot['balances'].get(participant, 0)
         # Devuelve el saldo total
         return amount_received - amount_sent
 
@@ -176,29 +420,43 @@ class Blockchain:
     # Uno obligatorio (transaction_amount) y otro opcional (last_transaction)
     # El opcional es opcional porque tiene un valor por defecto => [1]
 
-    def add_transaction(self, recipient, sender, signature, amount=1.0, is_receiving=False):
+    def add_transaction(self, recipient, sender, signature, amount=1.0, is_receiving=False, hops=0,
+                        scheme=DEFAULT_SCHEME):
         """ Añade a la blockchain un nuevo valor, así como el último valor de la blockchain.
 
         Argumentos:
             :sender: El remitente de las monedas.
             :recipient: El destinatario de las monedas.
             :amount: La cantidad de monedas enviadas con la transacción (por defecto = 1.0).
+            :is_receiving: Si la transacción se ha recibido de otro nodo.
+            :hops: Número de saltos que lleva recorridos la transacción (modo gossip).
+            :scheme: El esquema de la firma ('rsa' o 'ed25519').
         """
-        transaction = Transaction(sender, recipient, signature, amount)
+        transaction = Transaction(sender, recipient, signature, amount, scheme)
+        tx_id = hash_transaction(transaction)
+        if is_receiving and self.propagation == 'gossip' and tx_id in self.__seen:
+            # Duplicado que llega por otro camino en la difusión gossip: ya se procesó
+            return True
         if Verification.verify_transaction(transaction, self.get_balance):
+            self.__seen.add(tx_id)
             self.__open_transactions.append(transaction)
-            self.save_data()
-            if not is_receiving:
-                for node in self.__peer_nodes:
-                    url = 'http://{}/broadcast-transaction'.format(node)
-                    try:
-                        response = requests.post(url, json={
-                                                 'sender': sender, 'recipient': recipient, 'amount': amount, 'signature': signature})
-                        if response.status_code == 400 or response.status_code == 500:
-                            print('Transaction declined, needs resolving')
-                            return False
-                    except requests.exceptions.ConnectionError:
+            # Sólo se añade la transacción al diario (no se reescribe todo el estado)
+            self.__journal.append(transaction)
+            self.state_version += 1
+            self.__notify('transaction_added', transaction)
+            payload = {'sender': sender, 'recipient': recipient,
+                       'amount': amount, 'signature': signature, 'scheme': scheme}
+            if self.propagation == 'gossip':
+                self.__gossip('broadcast-transaction', payload, hops)
+            elif not is_receiving:
+                for node in self.__peer_nodes.ranked():
+                    response = self.__contact_peer(
+                        node, 'broadcast-transaction', payload)
+                    if response is None:
                         continue
+                    if response.status_code == 400 or response.status_code == 500:
+                        print('Transaction declined, needs resolving')
+                        return False
             return True
         return False
 
@@ -210,98 +468,500 @@ class Blockchain:
         last_block = self.__chain[-1]
         # Hash del último bloque (=> para poder compararlo con el valor hash almacenado)
         hashed_block = hash_block(last_block)
-        proof = self.proof_of_work()
+        difficulty = self.difficulty_policy.next_difficulty(self.__chain)
+        if difficulty is None:
+            print('Faltan los bloques anteriores para calcular la dificultad')
+            return None
+        proof = self.proof_of_work(difficulty)
         # Los mineros deben ser recompensados, así que se genera una transacción de recompensa
         reward_transaction = Transaction(
             'RECOMPENSA_MINADO', self.public_key, '', MINING_REWARD)
         # Copiar transacción en lugar de manipular la lista original open_transactions
         # Esto asegura que si por alguna razón la minería fallara, no tenemos la transacción de recompensa almacenada en las transacciones abiertas
         copied_transactions = self.__open_transactions[:]
-        for tx in copied_transactions:
-            if not Wallet.verify_transaction(tx):
-                return None
+        if not all(Wallet.verify_transactions(copied_transactions)):
+            return None
         copied_transactions.append(reward_transaction)
-        block = Block(len(self.__chain), hashed_block,
-                      copied_transactions, proof)
-        self.__chain.append(block)
-        self.__open_transactions = []
+        # La marca de tiempo sale del reloj del transporte (el simulado, en el simulador)
+        timestamp = max(self.transport.now(),
+                        self.difficulty_policy.min_timestamp(self.__chain))
+        block = Block(last_block.index + 1, hashed_block,
+                      copied_transactions, proof, timestamp, difficulty)
+        self.__apply_block(block)
+        self.__set_open_transactions([])
+        self.__prune()
         self.save_data()
-        for node in self.__peer_nodes:
-            url = 'http://{}/broadcast-block'.format(node)
-            converted_block = block.__dict__.copy()
-            converted_block['transactions'] = [
-                tx.__dict__ for tx in converted_block['transactions']]
-            try:
-                response = requests.post(url, json={'block': converted_block})
-                if response.status_code == 400 or response.status_code == 500:
-                    print('Block declined, needs resolving')
-                if response.status_code == 409:
-                    self.resolve_conflicts = True
-            except requests.exceptions.ConnectionError:
+        message = self.__block_message(block)
+        self.__seen.add(compact_block_id(message['compact_block']))
+        if self.propagation == 'gossip':
+            self.__gossip('broadcast-block', message, 0)
+            return block
+        for node in self.__peer_nodes.ranked():
+            response = self.__contact_peer(node, 'broadcast-block', message)
+            if response is None:
                 continue
+            if response.status_code == 400 or response.status_code == 500:
+                print('Block declined, needs resolving')
+            if response.status_code == 409:
+                self.resolve_conflicts = True
         return block
 
-    def add_block(self, block):
-        """Add a block which was received via broadcasting to the local blockchain."""
-        # Create a list of transaction objects
-        transactions = [Transaction(
-            tx['sender'], tx['recipient'], tx['signature'], tx['amount']) for tx in block['transactions']]
+    def __block_message(self, block):
+        """Builds the broadcast message for a block: its compact form plus this node's address,
+        so that receivers know where to fetch the transactions they are missing."""
+        return {'compact_block': compact_block(block), 'node': self.address}
+
+    def is_known_block(self, block):
+        """Check whether a block received via broadcasting was already processed by this node.
+
+        Arguments:
+            :block: The received block (as a dictionary, either full or compact).
+        """
+        if 'short_ids' not in block:
+            block = compact_block(self.__to_blocks([block])[0])
+        return compact_block_id(block) in self.__seen
+
+    def expand_compact_block(self, compact, node=None):
+        """Rebuild a full block (as a dictionary) from a compact block.
+
+        The transactions are taken from the open transactions; the missing ones are
+        requested from the node that sent the block. Returns None if some transaction
+        could not be obtained.
+
+        Arguments:
+            :compact: The received compact block.
+            :node: The URL of the node that sent the block.
+        """
+        mempool = {short_id(tx): tx.__dict__ for tx in self.__open_transactions}
+        missing = [tx_id for tx_id in compact['short_ids'] if tx_id not in mempool]
+        if missing:
+            if node is None:
+                return None
+            response = self.__contact_peer(node, 'block-transactions?index={}&ids={}'.format(
+                compact['index'], ','.join(missing)))
+            if response is None or response.status_code != 200:
+                return None
+            for tx in response.json()['transactions']:
+                fetched = Transaction.from_dict(tx)
+                mempool[short_id(fetched)] = fetched.__dict__
+            if not all(tx_id in mempool for tx_id in missing):
+                return None
+        block = {key: value for key, value in compact.items()
+                 if key not in ('short_ids', 'reward')}
+        block['transactions'] = [mempool[tx_id] for tx_id in compact['short_ids']]
+        if compact['reward'] is not None:
+            block['transactions'].append(compact['reward'])
+        return block
+
+    def get_block_transactions(self, index, short_ids):
+        """Return the transactions (as dictionaries) of the block at the given index whose
+        short ids were requested, or None if there is no such block.
+
+        Arguments:
+            :index: The index of the block.
+            :short_ids: The short ids of the requested transactions.
+        """
+        block = self.get_block(index)
+        if block is None or getattr(block, 'pruned', False):
+            return None
+        requested = set(short_ids)
+        return [tx.__dict__ for tx in block.transactions
+                if short_id(tx) in requested]
+
+    def __gossip(self, path, payload, hops):
+        """Relays a message to a random subset of peers unless it reached the hop limit.
+
+        Arguments:
+            :path: The endpoint the message is sent to.
+            :payload: The message data (the hop count is added to it).
+            :hops: The number of hops the message has already travelled.
+        """
+        if hops >= self.gossip_max_hops:
+            return
+        peers = self.__peer_nodes.ranked()
+        relayed = dict(payload, hops=hops + 1)
+        for node in random.sample(peers, min(self.gossip_fanout, len(peers))):
+            self.__contact_peer(node, path, relayed)
+
+    def add_block(self, block, hops=0):
+        """Add a block which was received via broadcasting to the local blockchain.
+
+        Arguments:
+            :block: The received block (as a dictionary).
+            :hops: The number of hops the block has travelled (gossip mode).
+        """
+        # Create a Block object (with its list of transaction objects)
+        converted_block = self.__to_blocks([block])[0]
+        transactions = converted_block.transactions
+        # The difficulty must be the one the retargeting rule gives for the next block
+        difficulty_is_valid = (converted_block.difficulty ==
+                               self.difficulty_policy.next_difficulty(self.__chain))
+        # The timestamp must not go back in time (median of the last blocks) nor too far ahead
+        timestamp_is_valid = (
+            self.difficulty_policy.valid_timestamp(
+                self.__chain, timestamp=converted_block.timestamp) and
+            converted_block.timestamp <= self.transport.now() + MAX_FUTURE_BLOCK_TIME)
         # Validate the proof of work of the block and store the result (True or False) in a variable
-        proof_is_valid = Verification.valid_proof(
-            transactions[:-1], block['previous_hash'], block['proof'])
+        proof_is_valid = difficulty_is_valid and Verification.valid_proof(
+            transactions[:-1], block['previous_hash'], block['proof'], converted_block.difficulty)
         # Check if previous_hash stored in the block is equal to the local blockchain's last block's hash and store the result in a block
-        hashes_match = hash_block(self.chain[-1]) == block['previous_hash']
-        if not proof_is_valid or not hashes_match:
+        hashes_match = hash_block(self.__chain[-1]) == block['previous_hash']
+        if not (difficulty_is_valid and timestamp_is_valid and proof_is_valid and hashes_match):
             return False
-        # Create a Block object
-        converted_block = Block(
-            block['index'], block['previous_hash'], transactions, block['proof'], block['timestamp'])
-        self.__chain.append(converted_block)
-        stored_transactions = self.__open_transactions[:]
-        # Check which open transactions were included in the received block and remove them
-        # This could be improved by giving each transaction an ID that would uniquely identify it
-        for itx in block['transactions']:
-            for opentx in stored_transactions:
-                if opentx.sender == itx['sender'] and opentx.recipient == itx['recipient'] and opentx.amount == itx['amount'] and opentx.signature == itx['signature']:
-                    try:
-                        self.__open_transactions.remove(opentx)
-                    except ValueError:
-                        print('Item was already removed')
+        self.__apply_block(converted_block)
+        # Remove the open transactions that were included in the received block
+        self.__remove_confirmed(transactions)
+        self.__prune()
         self.save_data()
+        message = self.__block_message(converted_block)
+        self.__seen.add(compact_block_id(message['compact_block']))
+        if self.propagation == 'gossip':
+            self.__gossip('broadcast-block', message, hops)
         return True
 
     def resolve(self):
-        """Checks all peer nodes' blockchains and replaces the local one with longer valid ones."""
+        """Checks all peer nodes' blockchains and switches to the valid one with the most
+        accumulated work (the sum of the block difficulties after the fork point)."""
         # Initialize the winner chain with the local chain
         winner_chain = self.chain
         replace = False
-        for node in self.__peer_nodes:
-            url = 'http://{}/chain'.format(node)
+        # Healthy peers are asked first; peers that are backing off are skipped
+        for node in self.__peer_nodes.ranked():
+            # Send a request and store the response
+            response = self.__contact_peer(node, 'chain')
+            if response is None:
+                continue
             try:
-                # Send a request and store the response
-                response = requests.get(url)
                 # Retrieve the JSON data as a dictionary
                 node_chain = response.json()
                 # Convert the dictionary list to a list of block AND transaction objects
-                node_chain = [Block(block['index'], block['previous_hash'], [Transaction(
-                    tx['sender'], tx['recipient'], tx['signature'], tx['amount']) for tx in block['transactions']],
-                    block['proof'], block['timestamp']) for block in node_chain]
-                node_chain_length = len(node_chain)
-                local_chain_length = len(winner_chain)
-                # Store the received chain as the current winner chain if it's longer AND valid
-                if node_chain_length > local_chain_length and Verification.verify_chain(node_chain):
+                node_chain = self.__to_blocks(node_chain)
+                # The chains may start at different heights (snapshots, pruning): only the
+                # work after the block they share is compared
+                shared = self.find_fork_point(winner_chain, node_chain)
+                if (shared is None or
+                        chain_work(node_chain, shared) <= chain_work(winner_chain, shared)):
+                    continue
+                # Only the blocks after the fork point need verifying; the shared part may be
+                # pruned (headers only) on either side. The retarget window before the fork
+                # is kept as context for the expected difficulty
+                fork = self.find_fork_point(self.__chain, node_chain)
+                if fork is None:
+                    continue
+                first = max(fork - self.difficulty_policy.retarget_interval,
+                            node_chain[0].index)
+                # Store the received chain as the current winner chain if it has more work
+                # AND is valid
+                if Verification.verify_chain(node_chain[first - node_chain[0].index:],
+                                             self.difficulty_policy, start=fork - first,
+                                             now=self.transport.now()):
                     winner_chain = node_chain
                     replace = True
-            except requests.exceptions.ConnectionError:
+            except (ValueError, KeyError, TypeError, IndexError):
                 continue
         self.resolve_conflicts = False
-        # Replace the local chain with the winner chain
-        self.chain = winner_chain
         if replace:
-            self.__open_transactions = []
-        self.save_data()
+            replace = self.reorganize(winner_chain) is not None
+        # Sólo se guarda (y caducan las respuestas cacheadas) si la cadena ha cambiado
+        if replace:
+            self.save_data()
         return replace
 
+    @staticmethod
+    def find_fork_point(chain, other_chain):
+        """Return the index of the last block shared by two chains, or None if they share
+        no block (the chains may start at different indexes, e.g. after a snapshot).
+
+        Both chains are hash-linked, so once a block differs every later block differs
+        too; this allows a binary search over the common index range.
+
+        Arguments:
+            :chain: The first chain.
+            :other_chain: The second chain.
+        """
+        start = max(chain[0].index, other_chain[0].index)
+        low, high = start, min(chain[-1].index, other_chain[-1].index)
+        fork = None
+        while low <= high:
+            middle = (low + high) // 2
+            if (hash_block(chain[middle - chain[0].index]) ==
+                    hash_block(other_chain[middle - other_chain[0].index])):
+                fork = middle
+                low = middle + 1
+            else:
+                high = middle - 1
+        return fork
+
+    def reorganize(self, new_chain):
+        """Switch to a (verified) competing chain, rolling back only the diverging blocks.
+
+        The blocks after the fork point are undone newest first and the winning branch is
+        applied on top, notifying the observers of every step. Transactions from the undone
+        blocks that are still valid against the new chain go back to the open transactions.
+
+        Arguments:
+            :new_chain: The winning chain.
+        """
+        fork = self.find_fork_point(self.__chain, new_chain)
+        # Blocks below the base snapshot (bootstrapped or pruned) cannot be rolled back
+        if fork is None or fork < self.get_base_height():
+            return None
+        undone = []
+        while self.__chain[-1].index > fork:
+            undone.insert(0, self.__undo_block())
+        applied = [block for block in new_chain if block.index > fork]
+        for block in applied:
+            self.__apply_block(block)
+        # Orphaned transactions (without the mining rewards) go before the current open ones
+        previous_open = self.__open_transactions
+        candidates = [tx for block in undone for tx in block.transactions
+                      if tx.sender != 'RECOMPENSA_MINADO'] + previous_open
+        self.__open_transactions = []
+        confirmed = set(hash_transaction(tx)
+                        for block in applied for tx in block.transactions)
+        for tx in candidates:
+            tx_id = hash_transaction(tx)
+            if tx_id in confirmed:
+                continue
+            if Verification.verify_transaction(tx, self.get_balance):
+                confirmed.add(tx_id)
+                self.__open_transactions.append(tx)
+        # Se restaura la lista anterior para avisar sólo de las diferencias
+        accepted, self.__open_transactions = self.__open_transactions, previous_open
+        self.__set_open_transactions(accepted)
+        self.__notify('chain_reorganized', fork, undone, applied)
+        self.__prune()
+        return fork
+
+    def create_snapshot(self):
+        """Build a hash-committed snapshot of the balances at the current height."""
+        last_block = self.__chain[-1]
+        return build_snapshot(last_block.index, hash_block(last_block),
+                              self.ledger.balance_map())
+
+    def get_snapshot(self):
+        """Return the latest snapshot other nodes can bootstrap from (None if there is none).
+
+        A pruned node can only serve the blocks after its pruned height, so if its latest
+        periodic snapshot is older than that it serves its base snapshot instead.
+        """
+        snapshot = load_snapshot(self.node_id)
+        if (self.__base_snapshot is not None and
+                (snapshot is None or snapshot['height'] < self.__base_snapshot['height'])):
+            return self.__base_snapshot
+        return snapshot
+
+    def get_base_height(self):
+        """Return the height of the base snapshot whose balances the chain builds on
+        (the first block index if the chain starts at genesis)."""
+        if self.__base_snapshot is not None:
+            return self.__base_snapshot['height']
+        return self.__chain[0].index
+
+    def is_pruned(self):
+        """Return True if this node runs in pruned mode."""
+        return self.prune_depth is not None
+
+    def __prune(self):
+        """Drop the transaction bodies of the blocks older than prune_depth.
+
+        The balances at the new pruned height become the base snapshot, the pruned blocks
+        are replaced by their headers (which keep the block hash for the previous_hash links)
+        and the ledger columns and address index forget the pruned rows.
+        """
+        if self.prune_depth is None:
+            return
+        height = self.__chain[-1].index - self.prune_depth
+        if height <= self.get_base_height():
+            return
+        balances = self.ledger.balance_map(height)
+        self.__base_snapshot = build_snapshot(
+            height, hash_block(self.get_block(height)), balances)
+        self.ledger.set_base_balances(balances)
+        self.ledger.drop_until(height)
+        self.address_index.prune(height)
+        first = self.__chain[0].index
+        start = 0 if self.pruned_height is None else self.pruned_height + 1 - first
+        for position in range(max(start, 0), height - first + 1):
+            block = self.__chain[position]
+            self.__chain[position] = BlockHeader(
+                block.index, block.previous_hash, block.timestamp, block.proof, hash_block(block),
+                block.difficulty)
+        self.pruned_height = height
+
+    @staticmethod
+    def __to_blocks(dict_chain):
+        """Convert a list of block dictionaries into Block (or pruned BlockHeader) and
+        Transaction objects."""
+        # Blocks without a difficulty were created before it was stored: they keep None so
+        # that verification can grandfather them (they were mined with the initial one)
+        return [BlockHeader(block['index'], block['previous_hash'], block['timestamp'],
+                            block['proof'], block['block_hash'], block.get('difficulty'))
+                if block.get('pruned') else
+                Block(block['index'], block['previous_hash'], [Transaction.from_dict(tx) for tx in block['transactions']],
+                    block['proof'], block['timestamp'], block.get('difficulty'))
+                for block in dict_chain]
+
+    def bootstrap_from_snapshot(self, node, background=True):
+        """Initialize a fresh node from a peer's snapshot instead of the full history.
+
+        The snapshot commitment is checked, only the blocks from the snapshot height on are
+        downloaded and verified, and the full history is verified afterwards (in a background
+        thread by default). Returns the snapshot height, or None if bootstrapping failed.
+
+        Arguments:
+            :node: The URL of the peer node that serves the snapshot.
+            :background: Whether to verify the full history in a background thread.
+        """
+        if len(self.__chain) > 1:
+            return None
+        response = self.__contact_peer(node, 'snapshot')
+        if response is None or response.status_code != 200:
+            return None
+        snapshot = response.json()
+        if not verify_snapshot(snapshot):
+            print('Snapshot commitment does not match')
+            return None
+        # The retarget window before the snapshot is downloaded too: the difficulty of the
+        # next blocks is computed from its timestamps
+        response = self.__contact_peer(node, 'chain?from_height={}'.format(
+            max(0, snapshot['height'] - self.difficulty_policy.retarget_interval)))
+        if response is None or response.status_code != 200:
+            return None
+        blocks = self.__to_blocks(response.json())
+        position = snapshot['height'] - blocks[0].index if blocks else -1
+        if (not 0 <= position < len(blocks) or
+                hash_block(blocks[position]) != snapshot['block_hash'] or
+                not Verification.verify_chain(blocks, self.difficulty_policy, start=position,
+                                              now=self.transport.now())):
+            return None
+        # Replace the genesis-only chain with the chain starting at the snapshot (and its
+        # retarget window, whose transactions are already in the snapshot balances)
+        self.__undo_block()
+        self.__base_snapshot = snapshot
+        self.ledger.set_base_balances(snapshot['balances'])
+        self.__chain.extend(blocks[:position + 1])
+        for block in blocks[position + 1:]:
+            self.__chain.append(block)
+            self.__notify('block_applied', block)
+        self.__set_open_transactions([])
+        self.history_verified = None
+        self.__prune()
+        self.save_data()
+        if background:
+            threading.Thread(target=self.__verify_history_until_done,
+                             args=(node,), daemon=True).start()
+        else:
+            self.verify_history(node)
+        return snapshot['height']
+
+    def __verify_history_until_done(self, node, delay=None):
+        """Verify the history with the given peer (if any) or, failing that, any other peer.
+        If none of them can serve it, try again later (with an exponential backoff)."""
+        if self.__base_snapshot is None or self.history_verified is not None:
+            return
+        if delay is None:
+            delay = HISTORY_RETRY_INTERVAL
+        candidates = [node] if node is not None else []
+        candidates += [peer for peer in self.__peer_nodes.ranked() if peer != node]
+        for candidate in candidates:
+            if self.verify_history(candidate) is not None:
+                return
+        timer = threading.Timer(delay, self.__verify_history_until_done,
+                                args=(node, min(delay * 2, MAX_BACKOFF)))
+        timer.daemon = True
+        timer.start()
+
+    def __restart_from_genesis(self):
+        """Discard the chain and the base snapshot it builds on (whose balances could not be
+        verified) and start over from the genesis block."""
+        while self.__chain[-1].index > self.get_base_height():
+            self.__undo_block()
+        self.__base_snapshot = None
+        self.pruned_height = None
+        self.ledger.set_base_balances({})
+        # Periodic snapshots built on top of the discarded base must not be served to peers
+        remove_snapshot(self.node_id)
+        genesis_block = Block(0, '', [], 100, 0)
+        self.__chain = [genesis_block]
+        self.__notify('block_applied', genesis_block)
+        # Open transactions were checked against the discarded balances
+        self.__set_open_transactions([])
+        self.save_data()
+
+    def verify_history(self, node):
+        """Download the full history from a peer and check that it leads to the snapshot
+        this chain starts from: valid links and proofs, the same block hash at the snapshot
+        height and the same balances. The result is stored in history_verified. If the history
+        does not match, the snapshot is discarded and the chain is synced again from genesis.
+        Returns None if the peer could not serve the full history.
+
+        Arguments:
+            :node: The URL of the peer node that serves the full chain.
+        """
+        snapshot = self.__base_snapshot
+        if snapshot is None:
+            self.history_verified = True
+            return True
+        response = self.__contact_peer(node, 'chain')
+        try:
+            history = self.__to_blocks(response.json())[:snapshot['height'] + 1]
+        except (AttributeError, ValueError, KeyError, TypeError):
+            return None
+        if any(getattr(block, 'pruned', False) for block in history):
+            print('Peer {} is pruned, cannot verify the full history'.format(node))
+            return None
+        verified = (len(history) == snapshot['height'] + 1 and
+                    Verification.verify_chain(history, self.difficulty_policy,
+                                              now=self.transport.now()) and
+                    hash_block(history[-1]) == snapshot['block_hash'])
+        if verified:
+            ledger = LedgerColumns()
+            for block in history:
+                ledger.block_applied(block)
+            balances = ledger.balance_map()
+            verified = all(abs(balances.get(address, 0) - amount) < 1e-9
+                           for address, amount in snapshot['balances'].items()) and \
+                all(address in snapshot['balances'] or amount == 0
+                    for address, amount in balances.items())
+        self.history_verified = verified
+        if verified:
+            self.save_data()
+        else:
+            print('Snapshot history verification failed, syncing again from genesis')
+            self.__restart_from_genesis()
+            self.resolve()
+        return verified
+
+    def __contact_peer(self, node, path, payload=None):
+        """Sends a request to a peer node and records its health.
+
+        Returns the response, or None if the peer could not be reached.
+
+        Arguments:
+            :node: The peer node URL.
+            :path: The endpoint path (without the leading slash).
+            :payload: The JSON data to POST (a GET is sent if None).
+        """
+        started = self.transport.now()
+        try:
+            if payload is None:
+                response = self.transport.get(node, path, timeout=PEER_TIMEOUT)
+            else:
+                response = self.transport.post(
+                    node, path, payload, timeout=PEER_TIMEOUT)
+        except requests.exceptions.RequestException:
+            if self.__peer_nodes.record_failure(node):
+                print('Peer {} evicted'.format(node))
+                self.__notify('peers_changed', self.get_peer_nodes())
+                self.save_data()
+            return None
+        elapsed = getattr(response, 'elapsed', None)
+        latency = (elapsed.total_seconds() if elapsed is not None
+                   else self.transport.now() - started)
+        self.__peer_nodes.record_success(node, latency)
+        return response
+
     def add_peer_node(self, node):
         """Adds a new node to the peer node set.
 
@@ -309,6 +969,7 @@ class Blockchain:
             :node: The node URL which should be added.
         """
         self.__peer_nodes.add(node)
+        self.__notify('peers_changed', self.get_peer_nodes())
         self.save_data()
 
     def remove_peer_node(self, node):
@@ -317,9 +978,18 @@ class Blockchain:
         Arguments:
             :node: The node URL which should be removed.
         """
-        self.__peer_nodes.discard(node)
+        self.__peer_nodes.remove(node)
+        self.__notify('peers_changed', self.get_peer_nodes())
         self.save_data()
 
+    def close(self):
+        """Escribe en el disco las transacciones pendientes del diario y lo cierra."""
+        self.__journal.close()
+
     def get_peer_nodes(self):
         """Return a list of all connected peer nodes."""
-        return list(self.__peer_nodes)
+        return self.__peer_nodes.addresses()
+
+    def get_peer_health(self):
+        """Return the health (latency, failures, last seen time) of every peer node."""
+        return self.__peer_nodes.health()
@@ -1,11 +1,63 @@
-from flask import Flask, jsonify, request, send_from_directory
+from functools import wraps
+
+from flask import Flask, jsonify, make_response, redirect, request, send_from_directory
 from flask_cors import CORS
 
 from wallet import Wallet
 from blockchain import Blockchain
+from utility.response_cache import ResponseCache
+from utility.event_stream import EventHub, ChainEvents
+from utility.signature_schemes import DEFAULT_SCHEME, SCHEMES
+from utility.difficulty import DifficultyPolicy, RETARGET_INTERVAL, TARGET_BLOCK_TIME
+from utility.mempool_journal import DURABILITY_MODES, FSYNC_INTERVAL, BATCH_SIZE
 
 app = Flask(__name__)
 CORS(app)
+# Caché de las respuestas de los endpoints de lectura (las consulta la interfaz web periódicamente)
+response_cache = ResponseCache()
+# Servidor del flujo de eventos (se arranca en __main__ en su propio puerto)
+event_hub = None
+# La blockchain del nodo (se crea en __main__ y al crear o cargar el monedero)
+blockchain = None
+
+
+def create_blockchain(public_key):
+    """
+    Crea la blockchain del nodo con la clave pública dada, vacía la caché de respuestas y
+    conecta la blockchain con el flujo de eventos. Los clientes suscritos reciben un evento
+    'reset' para que vuelvan a cargar el estado completo.
+    """
+    # La blockchain anterior escribe antes su diario de transacciones abiertas
+    if blockchain is not None:
+        blockchain.close()
+    chain = Blockchain(public_key, port, **node_config)
+    response_cache.clear()
+    if event_hub is not None:
+        chain.add_observer(ChainEvents(event_hub), replay=False)
+        event_hub.publish('reset', {})
+    return chain
+
+
+def cached_response(view):
+    """
+    Decorador para los endpoints de lectura: sirve la respuesta desde la caché mientras no
+    cambie la versión del estado de la blockchain. La clave incluye la ruta y los parámetros
+    de la consulta. Sólo se guardan las respuestas 200 OK.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        version = blockchain.state_version
+        cached = response_cache.get(key, version)
+        if cached is not None:
+            body, status, headers = cached
+            return app.response_class(body, status=status, headers=headers)
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response_cache.put(key, version, response.get_data(),
+                               response.status_code, list(response.headers.items()))
+        return response
+    return wrapper
 
 
 @app.route('/', methods=['GET'])
@@ -32,14 +84,27 @@ def create_keys():
     """
     Crea un nuevo par de claves pública y privada para el monedero, lo guarda e inicializa
     una nueva blockchain con la clave pública. 
+
+    Datos opcionales de la solicitud POST:
+      - scheme (str): esquema de firma de las nuevas claves ('rsa' o 'ed25519'); por defecto,
+        el del monedero actual.
     """
+    values = request.get_json(silent=True) or {}
+    scheme = values.get('scheme', wallet.scheme)
+    if scheme not in SCHEMES:
+        response = {
+            'message': 'Esquema de firma no disponible.'
+        }
+        return jsonify(response), 400
+    wallet.scheme = scheme
     wallet.create_keys()
     if wallet.save_keys():
         global blockchain
-        blockchain = Blockchain(wallet.public_key, port)
+        blockchain = create_blockchain(wallet.public_key)
         response = {
             'public_key': wallet.public_key,
             'private_key': wallet.private_key,
+            'scheme': wallet.scheme,
             'funds': blockchain.get_balance()
         }
         return jsonify(response), 201
@@ -61,10 +126,11 @@ def load_keys():
     """
     if wallet.load_keys():
         global blockchain
-        blockchain = Blockchain(wallet.public_key, port)
+        blockchain = create_blockchain(wallet.public_key)
         response = {
             'public_key': wallet.public_key,
             'private_key': wallet.private_key,
+            'scheme': wallet.scheme,
             'funds': blockchain.get_balance()
         }
         return jsonify(response), 201
@@ -76,6 +142,7 @@ def load_keys():
 
 
 @app.route('/balance', methods=['GET'])
+@cached_response
 def get_balance():
     """
     Este endpoint devuelve el saldo actual del monedero asociado a la blockchain.
@@ -107,6 +174,7 @@ def broadcast_transaction():
     - recipient (cadena): clave pública del destinatario
     - amount (float): cantidad de criptomoneda que se transfiere
     - signature (str): firma digital de la transacción
+    - hops (int, opcional): saltos recorridos por la transacción (propagación gossip)
 
     Devuelve:
     - message (str): mensaje que indica si la transacción se ha añadido correctamente o no
@@ -115,6 +183,7 @@ def broadcast_transaction():
       - recipient (cadena): clave pública del destinatario
       - amount (float): cantidad de criptomoneda que se transfiere
       - signature (str): firma digital de la transacción
+      - scheme (str, opcional): esquema de la firma ('rsa' por defecto o 'ed25519')
     """
     values = request.get_json()
     if not values:
@@ -125,7 +194,8 @@ def broadcast_transaction():
         response = {'message': 'Some data is missing.'}
         return jsonify(response), 400
     success = blockchain.add_transaction(
-        values['recipient'], values['sender'], values['signature'], values['amount'], is_receiving=True)
+        values['recipient'], values['sender'], values['signature'], values['amount'], is_receiving=True,
+        hops=values.get('hops', 0), scheme=values.get('scheme', DEFAULT_SCHEME))
     if success:
         response = {
             'message': 'Successfully added transaction.',
@@ -133,7 +203,8 @@ def broadcast_transaction():
                 'sender': values['sender'],
                 'recipient': values['recipient'],
                 'amount': values['amount'],
-                'signature': values['signature']
+                'signature': values['signature'],
+                'scheme': values.get('scheme', DEFAULT_SCHEME)
             }
         }
         return jsonify(response), 201
@@ -151,12 +222,20 @@ def broadcast_block():
     y lo añade a la copia local de la blockchain si es válido.
 
     El método recibe un objeto JSON que contiene el nuevo bloque en el campo
-    'block'. El bloque se añade a la blockchain si tiene el índice correcto,
+    'block' o, en su forma compacta, en el campo 'compact_block' (cabecera,
+    identificadores cortos de las transacciones y transacción de recompensa) junto
+    con la URL del nodo emisor en el campo 'node'. El bloque compacto se reconstruye
+    con las transacciones abiertas locales, pidiendo al emisor sólo las que falten;
+    si no se puede reconstruir, se marca la blockchain para resolver conflictos.
+    El bloque se añade a la blockchain si tiene el índice correcto,
     y se valida su contenido. Si el índice del nuevo bloque es mayor que el
     de la cadena local, el método establece una bandera para resolver conflictos
     con los demás nodos de la red. Si el índice del bloque es menor o igual que
     la cadena local, se rechaza.
 
+    Los bloques que ya se han procesado (duplicados que llegan por otro camino en la
+    propagación gossip) se ignoran sin señalar ningún conflicto.
+
     El método devuelve una respuesta JSON que indica si el bloque se ha añadido
     a la blockchain local o no, y el motivo.
     """
@@ -164,12 +243,22 @@ def broadcast_block():
     if not values:
         response = {'message': 'No se han encontrado datos.'}
         return jsonify(response), 400
-    if 'block' not in values:
+    if 'block' not in values and 'compact_block' not in values:
         response = {'message': 'Faltan algunos datos.'}
         return jsonify(response), 400
-    block = values['block']
+    block = values.get('block', values.get('compact_block'))
+    if blockchain.is_known_block(block):
+        response = {'message': 'El bloque ya era conocido.'}
+        return jsonify(response), 200
+    if 'compact_block' in values and block['index'] == blockchain.chain[-1].index + 1:
+        block = blockchain.expand_compact_block(block, values.get('node'))
+        if block is None:
+            response = {
+                'message': 'No se ha podido reconstruir el bloque compacto.'}
+            blockchain.resolve_conflicts = True
+            return jsonify(response), 200
     if block['index'] == blockchain.chain[-1].index + 1:
-        if blockchain.add_block(block):
+        if blockchain.add_block(block, values.get('hops', 0)):
             response = {'message': 'Bloque añadido'}
             return jsonify(response), 201
         else:
@@ -186,6 +275,37 @@ def broadcast_block():
         return jsonify(response), 409
 
 
+@app.route('/block-transactions', methods=['GET'])
+def get_block_transactions():
+    """
+    Este endpoint devuelve las transacciones de un bloque de la cadena local que pide otro
+    nodo para reconstruir un bloque compacto.
+
+    Parámetros de la consulta:
+    - index (int): índice del bloque
+    - ids (str): identificadores cortos de las transacciones separados por comas
+
+    Devuelve una respuesta JSON con la lista de transacciones encontradas y un código de
+    estado 200 OK, o un código 404 Not Found si el bloque no existe en la cadena local o
+    si sus transacciones se han podado.
+    """
+    index = request.args.get('index', type=int)
+    ids = request.args.get('ids', '')
+    if index is None:
+        response = {'message': 'Falta el índice del bloque.'}
+        return jsonify(response), 400
+    transactions = blockchain.get_block_transactions(
+        index, [tx_id for tx_id in ids.split(',') if tx_id])
+    if transactions is None:
+        response = {
+            'message': 'No se ha encontrado el bloque o sus transacciones se han podado.',
+            'pruned': blockchain.is_pruned()
+        }
+        return jsonify(response), 404
+    response = {'transactions': transactions}
+    return jsonify(response), 200
+
+
 @app.route('/transaction', methods=['POST'])
 def add_transaction():
     """
@@ -225,7 +345,7 @@ def add_transaction():
     amount = values['amount']
     signature = wallet.sign_transaction(wallet.public_key, recipient, amount)
     success = blockchain.add_transaction(
-        recipient, wallet.public_key, signature, amount)
+        recipient, wallet.public_key, signature, amount, scheme=wallet.scheme)
     if success:
         response = {
             'message': 'Transacción añadida correctamente.',
@@ -233,7 +353,8 @@ def add_transaction():
                 'sender': wallet.public_key,
                 'recipient': recipient,
                 'amount': amount,
-                'signature': signature
+                'signature': signature,
+                'scheme': wallet.scheme
             },
             'funds': blockchain.get_balance()
         }
@@ -308,6 +429,7 @@ def resolve_conflicts():
 
 
 @app.route('/transactions', methods=['GET'])
+@cached_response
 def get_open_transaction():
     """
     Este endpoint permite a un usuario recuperar una lista de transacciones pendientes 
@@ -324,6 +446,7 @@ def get_open_transaction():
 
 
 @app.route('/chain', methods=['GET'])
+@cached_response
 def get_chain():
     """
     Este endpoint permite al usuario recuperar una instantánea de la copia local de la blockchain.
@@ -332,15 +455,192 @@ def get_chain():
     bloques del blockchain. A continuación, crea una representación de diccionario de cada bloque,
     incluyendo las transacciones del bloque.
 
+    Con el parámetro opcional from_height sólo se devuelven los bloques a partir de esa altura
+    (lo utilizan los nodos que arrancan desde una instantánea).
+
+    Si el nodo está podado, los bloques antiguos se devuelven sólo con su cabecera (marcados con
+    'pruned': True y con el hash del bloque completo en 'block_hash') y la respuesta incluye las
+    cabeceras X-Pruned y X-Pruned-Height.
+
     Por último, la función devuelve una respuesta JSON con un código de estado 200 OK que contiene
     la lista de bloques de la cadena junto con sus respectivas transacciones.
     """
-    chain_snapshot = blockchain.chain
+    from_height = request.args.get('from_height', 0, type=int)
+    chain_snapshot = [block for block in blockchain.chain if block.index >= from_height]
     dict_chain = [block.__dict__.copy() for block in chain_snapshot]
     for dict_block in dict_chain:
         dict_block['transactions'] = [
             tx.__dict__ for tx in dict_block['transactions']]
-    return jsonify(dict_chain), 200
+    headers = {'X-Pruned': str(blockchain.is_pruned()).lower()}
+    if blockchain.pruned_height is not None:
+        headers['X-Pruned-Height'] = str(blockchain.pruned_height)
+    return jsonify(dict_chain), 200, headers
+
+
+@app.route('/history/<address>', methods=['GET'])
+@cached_response
+def get_history(address):
+    """
+    Este endpoint devuelve, paginado, el historial de transacciones confirmadas en las que
+    participa una dirección (como remitente o destinatario), de la más reciente a la más antigua.
+
+    La consulta se resuelve con el índice de transacciones por dirección de la blockchain, por
+    lo que el coste de cada página no depende de la longitud de la cadena.
+
+    Parámetros de la consulta (todos opcionales):
+    - page (int): número de página, empezando en 1 (por defecto 1)
+    - page_size (int): transacciones por página (por defecto 20, máximo 100)
+    - from_height / to_height (int): rango de alturas de bloque (incluidas)
+    - since / until (float): rango de marcas de tiempo de bloque (incluidas)
+
+    Devuelve una respuesta JSON con la página de transacciones (cada una con el índice del
+    bloque, su posición en el bloque y la marca de tiempo del bloque), el número total de
+    transacciones y los datos de la paginación.
+    """
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', 20, type=int)
+    if page < 1 or page_size < 1 or page_size > 100:
+        response = {
+            'message': 'Paginación no válida.'
+        }
+        return jsonify(response), 400
+    transactions, total = blockchain.get_history(
+        address, page, page_size,
+        request.args.get('from_height', type=int),
+        request.args.get('to_height', type=int),
+        request.args.get('since', type=float),
+        request.args.get('until', type=float))
+    response = {
+        'address': address,
+        'transactions': transactions,
+        'total': total,
+        'page': page,
+        'page_size': page_size
+    }
+    return jsonify(response), 200
+
+
+@app.route('/analytics/balances', methods=['GET'])
+@cached_response
+def get_all_balances():
+    """
+    Este endpoint devuelve el saldo confirmado de todas las direcciones de la blockchain.
+
+    Los saldos se calculan en una sola pasada vectorizada sobre el almacén columnar de
+    transacciones, en lugar de recorrer la cadena para cada dirección. Las transacciones
+    pendientes no se tienen en cuenta.
+    """
+    response = {
+        'balances': blockchain.ledger.balance_map()
+    }
+    return jsonify(response), 200
+
+
+@app.route('/analytics/top-holders', methods=['GET'])
+@cached_response
+def get_top_holders():
+    """
+    Este endpoint devuelve las direcciones con mayor saldo confirmado, de mayor a menor.
+
+    Parámetros de la consulta:
+    - limit (int, opcional): número de direcciones (por defecto 10)
+    """
+    limit = request.args.get('limit', 10, type=int)
+    if limit < 1:
+        response = {
+            'message': 'El límite debe ser positivo.'
+        }
+        return jsonify(response), 400
+    holders = blockchain.ledger.top_holders(limit)
+    response = {
+        'holders': [{'address': address, 'funds': funds} for address, funds in holders]
+    }
+    return jsonify(response), 200
+
+
+@app.route('/analytics/flows', methods=['GET'])
+@cached_response
+def get_flows():
+    """
+    Este endpoint devuelve los flujos de monedas en un rango de bloques: monedas creadas por
+    las recompensas de minado, monedas transferidas, número de transferencias y volumen
+    transferido en cada bloque.
+
+    Parámetros de la consulta (opcionales):
+    - from_height / to_height (int): rango de alturas de bloque (incluidas)
+    """
+    flows = blockchain.ledger.flow_totals(
+        request.args.get('from_height', type=int),
+        request.args.get('to_height', type=int))
+    return jsonify(flows), 200
+
+
+@app.route('/snapshot', methods=['GET'])
+def get_snapshot():
+    """
+    Este endpoint devuelve la última instantánea periódica del nodo: la altura H, el hash del
+    bloque a esa altura, el saldo de cada dirección a esa altura y el compromiso (hash) de todo
+    ello. Otros nodos la utilizan para arrancar sin descargar todo el historial.
+
+    Devuelve un código de estado 404 Not Found si el nodo todavía no ha guardado ninguna.
+    """
+    snapshot = blockchain.get_snapshot()
+    if snapshot is None:
+        response = {
+            'message': 'No hay ninguna instantánea disponible.'
+        }
+        return jsonify(response), 404
+    return jsonify(snapshot), 200
+
+
+@app.route('/bootstrap', methods=['POST'])
+def bootstrap():
+    """
+    Este endpoint inicializa un nodo nuevo a partir de la instantánea de otro nodo.
+
+    La solicitud debe contener el campo 'node' con la URL del nodo que sirve la instantánea.
+    Se comprueba el compromiso de la instantánea, se descargan y verifican sólo los bloques
+    posteriores a ella y la verificación del historial completo continúa en segundo plano.
+    Devuelve un código 201 Created con la altura de la instantánea o un código 500 si no se
+    ha podido arrancar desde ella (por ejemplo, porque la cadena local no está vacía).
+    """
+    values = request.get_json()
+    if not values or 'node' not in values:
+        response = {
+            'message': 'No se han encontrado datos del nodo.'
+        }
+        return jsonify(response), 400
+    height = blockchain.bootstrap_from_snapshot(values['node'])
+    if height is None:
+        response = {
+            'message': 'No se ha podido arrancar desde la instantánea.'
+        }
+        return jsonify(response), 500
+    response = {
+        'message': 'Nodo inicializado desde la instantánea.',
+        'height': height
+    }
+    return jsonify(response), 201
+
+
+@app.route('/bootstrap', methods=['GET'])
+def get_bootstrap_status():
+    """
+    Este endpoint devuelve la altura de la instantánea sobre la que se construye la cadena
+    local (0 si no se arrancó desde una instantánea ni se ha podado), si su historial está
+    verificado (True si el nodo ha comprobado él mismo todos los bloques o ya ha verificado el
+    historial anterior a la instantánea, None mientras esa verificación está pendiente y False
+    si no coincidía con la instantánea, que se ha descartado) y si el nodo está podado y hasta
+    qué altura.
+    """
+    response = {
+        'base_height': blockchain.get_base_height(),
+        'history_verified': blockchain.history_verified,
+        'pruned': blockchain.is_pruned(),
+        'pruned_height': blockchain.pruned_height,
+        'prune_depth': blockchain.prune_depth
+    }
+    return jsonify(response), 200
 
 
 @app.route('/node', methods=['POST'])
@@ -409,21 +709,106 @@ def get_nodes():
 
     La función llama al método get_peer_nodes() de la blockchain para recuperar una lista de
     todos los nodos pares de la red y, a continuación, devuelve una respuesta JSON con un código
-    de estado 200 OK que contiene la lista de todos los nodos de la red.
+    de estado 200 OK que contiene la lista de todos los nodos de la red junto con su estado
+    (latencia media, fallos consecutivos, última respuesta y si está en espera de reintento).
+
+    La respuesta no se cachea: si un nodo está en espera depende del reloj, no sólo de la
+    versión del estado.
     """
     nodes = blockchain.get_peer_nodes()
     response = {
-        'all_nodes': nodes
+        'all_nodes': nodes,
+        'peers': blockchain.get_peer_health()
     }
     return jsonify(response), 200
 
 
+@app.route('/events', methods=['GET'])
+def get_events():
+    """
+    Este endpoint redirige al flujo de eventos del nodo (server-sent events), que se sirve en
+    un puerto propio para atender a muchos suscriptores sin ocupar un hilo por cliente.
+
+    Los eventos son: 'block' (cabecera de un bloque nuevo), 'block_undone' y 'reorg'
+    (reorganizaciones de la cadena), 'transaction_added' y 'transactions_removed' (cambios en
+    las transacciones abiertas), 'peers' (cambios en los nodos homólogos) y 'reset' (el
+    cliente debe volver a cargar el estado completo).
+    """
+    if event_hub is None:
+        response = {
+            'message': 'El flujo de eventos no está disponible.'
+        }
+        return jsonify(response), 503
+    host = request.host.rsplit(':', 1)[0]
+    return redirect('http://{}:{}/events'.format(host, event_hub.port), code=307)
+
+
+@app.route('/events/stats', methods=['GET'])
+def get_event_stats():
+    """
+    Este endpoint devuelve el estado del flujo de eventos: suscriptores conectados, eventos
+    publicados y clientes desconectados por no consumir sus eventos a tiempo.
+    """
+    if event_hub is None:
+        response = {
+            'message': 'El flujo de eventos no está disponible.'
+        }
+        return jsonify(response), 503
+    return jsonify(event_hub.stats()), 200
+
+
+@app.route('/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Este endpoint devuelve las estadísticas de la caché de respuestas: aciertos, fallos, tasa
+    de aciertos, entradas y bytes guardados, expulsiones por tamaño e invalidaciones por
+    cambios de estado. Permite comprobar que las consultas periódicas se sirven desde memoria.
+    """
+    response = response_cache.stats()
+    response['state_version'] = blockchain.state_version
+    return jsonify(response), 200
+
+
 if __name__ == '__main__':
     from argparse import ArgumentParser
     parser = ArgumentParser()
     parser.add_argument('-p', '--port', type=int, default=5001)
+    parser.add_argument('--propagation', default='direct',
+                        choices=['direct', 'gossip'])
+    parser.add_argument('--address', default=None,
+                        help='URL (host:puerto) con la que los demás nodos contactan con este')
+    parser.add_argument('--prune-depth', type=int, default=None,
+                        help='Conserva sólo las transacciones de los últimos N bloques')
+    parser.add_argument('--scheme', default=DEFAULT_SCHEME, choices=sorted(SCHEMES),
+                        help='Esquema de firma de los monederos nuevos')
+    parser.add_argument('--target-block-time', type=float, default=TARGET_BLOCK_TIME,
+                        help='Intervalo objetivo entre bloques en segundos')
+    parser.add_argument('--retarget-interval', type=int, default=RETARGET_INTERVAL,
+                        help='Cada cuántos bloques se recalcula la dificultad')
+    parser.add_argument('--legacy-height', type=int, default=None,
+                        help='Altura máxima de los bloques sin dificultad (creados antes de '
+                             'guardarla; por defecto, sin límite)')
+    parser.add_argument('--mempool-durability', default='batch', choices=DURABILITY_MODES,
+                        help='sync: fsync por transacción; batch: fsync por lotes')
+    parser.add_argument('--fsync-interval', type=float, default=FSYNC_INTERVAL,
+                        help='Segundos máximos entre sincronizaciones del diario (modo batch)')
+    parser.add_argument('--journal-batch-size', type=int, default=BATCH_SIZE,
+                        help='Transacciones que fuerzan la escritura del lote (modo batch)')
+    parser.add_argument('--events-port', type=int, default=None,
+                        help='Puerto del flujo de eventos (por defecto, el puerto del nodo + 1000)')
     args = parser.parse_args()
     port = args.port
-    wallet = Wallet(port)
-    blockchain = Blockchain(wallet.public_key, port)
+    # Opciones con las que se crea la blockchain (también al crear o cargar el monedero)
+    node_config = {'propagation': args.propagation, 'address': args.address,
+                   'prune_depth': args.prune_depth,
+                   'difficulty_policy': DifficultyPolicy(args.target_block_time,
+                                                         args.retarget_interval,
+                                                         args.legacy_height),
+                   'mempool_durability': args.mempool_durability,
+                   'fsync_interval': args.fsync_interval,
+                   'journal_batch_size': args.journal_batch_size}
+    event_hub = EventHub(port=args.events_port or port + 1000)
+    event_hub.start()
+    wallet = Wallet(port, args.scheme)
+    blockchain = create_blockchain(wallet.public_key)
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,535 @@
+"""
+Simulador de red en un único proceso.
+
+Arranca N nodos (cada uno con su propio monedero y su propia blockchain) dentro del mismo
+proceso y los conecta mediante un transporte en memoria que reproduce la latencia, el ancho
+de banda y la pérdida de paquetes de cada enlace. El tiempo es simulado (reloj virtual), por
+lo que una ejecución de varios minutos de red se completa en pocos segundos.
+
+Sobre esa red se lanza una carga de transacciones y minado y se miden:
+    - la latencia de propagación de los bloques,
+    - el trabajo huérfano (bloques minados que no acaban en la cadena final),
+    - el tiempo de convergencia (hasta que todos los nodos comparten la misma cadena).
+
+Uso:
+    python simulator.py --nodes 8 --topology random --latency 0.05 --loss 0.01
+"""
+
+import contextlib
+import heapq
+import io
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from blockchain import Blockchain
+from utility.hash_util import hash_block
+from utility.signature_schemes import DEFAULT_SCHEME, SCHEMES
+from utility.difficulty import DifficultyPolicy, RETARGET_INTERVAL
+from wallet import Wallet
+
+
+class SimulatedResponse:
+    """Respuesta de un nodo simulado (imita la interfaz de requests.Response)."""
+
+    def __init__(self, status_code, data=None, elapsed=0.0):
+        self.status_code = status_code
+        self.elapsed = timedelta(seconds=elapsed)
+        self.__data = data
+
+    def json(self):
+        return self.__data
+
+
+class LinkProfile:
+    """
+    Características de un enlace entre dos nodos.
+
+    Atributos:
+        :latency: Latencia base del enlace en segundos.
+        :jitter: Variación aleatoria máxima de la latencia en segundos.
+        :bandwidth: Ancho de banda en bytes por segundo.
+        :loss: Probabilidad (entre 0 y 1) de que un mensaje se pierda.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.01, bandwidth=1000000, loss=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.loss = loss
+
+
+class SimulatedTransport:
+    """Transporte en memoria de un nodo simulado; delega en la red simulada."""
+
+    def __init__(self, network, address):
+        self.network = network
+        self.address = address
+
+    def post(self, node, path, payload, timeout=None):
+        return self.network.send(self.address, node, path, payload)
+
+    def get(self, node, path, timeout=None):
+        return self.network.request(self.address, node, path)
+
+    def now(self):
+        return self.network.clock
+
+
+class SimulatedNode:
+    """Un nodo de la red simulada: su monedero y su copia de la blockchain."""
+
+    def __init__(self, address, network, propagation='direct', prune_depth=None,
+                 scheme=DEFAULT_SCHEME, difficulty_policy=None):
+        self.address = address
+        self.wallet = Wallet(address, scheme)
+        self.wallet.create_keys()
+        self.blockchain = Blockchain(
+            self.wallet.public_key, address, SimulatedTransport(network, address), propagation,
+            address, prune_depth, difficulty_policy)
+
+
+def build_topology(kind, addresses, degree=3, rng=random):
+    """
+    Devuelve el conjunto de enlaces (pares de direcciones) de una topología.
+
+    Argumentos:
+        :kind: 'mesh' (todos con todos), 'ring' (anillo), 'star' (estrella) o
+               'random' (anillo más enlaces aleatorios hasta el grado medio indicado).
+        :addresses: Las direcciones de los nodos.
+        :degree: El grado medio deseado en la topología 'random'.
+        :rng: El generador de números aleatorios.
+    """
+    edges = set()
+    count = len(addresses)
+    if kind == 'mesh':
+        for i in range(count):
+            for j in range(i + 1, count):
+                edges.add((addresses[i], addresses[j]))
+    elif kind == 'star':
+        for address in addresses[1:]:
+            edges.add((addresses[0], address))
+    elif kind in ('ring', 'random'):
+        for i in range(count):
+            pair = tuple(sorted((addresses[i], addresses[(i + 1) % count])))
+            if pair[0] != pair[1]:
+                edges.add(pair)
+        if kind == 'random':
+            target = min(count * degree // 2, count * (count - 1) // 2)
+            while len(edges) < target:
+                pair = tuple(sorted(rng.sample(addresses, 2)))
+                edges.add(pair)
+    else:
+        raise ValueError('Topología desconocida: {}'.format(kind))
+    return edges
+
+
+def _serialize_chain(chain):
+    """Convierte una cadena en la lista de diccionarios que devuelve GET /chain."""
+    dict_chain = [block.__dict__.copy() for block in chain]
+    for dict_block in dict_chain:
+        dict_block['transactions'] = [
+            tx.__dict__ for tx in dict_block['transactions']]
+    return dict_chain
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SimulatedNetwork:
+    """
+    Red de nodos simulados con un reloj virtual y una cola de eventos.
+
+    Los mensajes POST (difusión de transacciones y bloques) se entregan de forma asíncrona
+    tras el retardo del enlace; las peticiones GET (sincronización de la cadena) se responden
+    de inmediato, pero su tamaño se contabiliza igualmente.
+    """
+
+    def __init__(self, seed=None, default_link=None, auto_resolve=True, propagation='direct',
+                 prune_depth=None, scheme=DEFAULT_SCHEME, difficulty_policy=None):
+        self.rng = random.Random(seed)
+        self.propagation = propagation
+        self.prune_depth = prune_depth
+        self.scheme = scheme
+        self.difficulty_policy = difficulty_policy
+        self.default_link = default_link if default_link is not None else LinkProfile()
+        self.auto_resolve = auto_resolve
+        self.clock = 0.0
+        self.nodes = {}
+        self.offline = set()
+        self.__links = {}
+        self.__link_busy = {}
+        self.__events = []
+        self.__sequence = 0
+        self.stats = {'messages': 0, 'bytes': 0, 'dropped': 0}
+        # hash del bloque -> (momento de minado, nodo minero)
+        self.mined_blocks = {}
+        # hash del bloque -> {nodo: momento en el que lo vio por primera vez}
+        self.block_seen = {}
+
+    def add_node(self, address):
+        """Crea un nuevo nodo simulado con la dirección dada."""
+        node = SimulatedNode(address, self, self.propagation, self.prune_depth, self.scheme,
+                             self.difficulty_policy)
+        self.nodes[address] = node
+        self.__observe(address)
+        return node
+
+    def connect(self, a, b, profile=None):
+        """Conecta dos nodos en ambos sentidos (opcionalmente con un perfil de enlace propio)."""
+        self.nodes[a].blockchain.add_peer_node(b)
+        self.nodes[b].blockchain.add_peer_node(a)
+        if profile is not None:
+            self.__links[(a, b)] = profile
+            self.__links[(b, a)] = profile
+
+    def set_online(self, address, online):
+        """Apaga o enciende un nodo (un nodo apagado no responde a ningún mensaje)."""
+        if online:
+            self.offline.discard(address)
+        else:
+            self.offline.add(address)
+
+    def link(self, src, dst):
+        """Devuelve el perfil del enlace entre dos nodos."""
+        return self.__links.get((src, dst), self.default_link)
+
+    def schedule(self, delay, action):
+        """Programa una acción (sin argumentos) para dentro de `delay` segundos simulados."""
+        self.__sequence += 1
+        heapq.heappush(self.__events,
+                       (self.clock + delay, self.__sequence, action))
+
+    def send(self, src, dst, path, payload):
+        """
+        Envía un mensaje asíncrono a través del enlace src -> dst. Un mensaje perdido se
+        traduce en un Timeout para el emisor (como ocurriría con una petición HTTP).
+        """
+        if dst not in self.nodes or dst in self.offline:
+            raise requests.exceptions.ConnectionError(dst)
+        profile = self.link(src, dst)
+        size = len(json.dumps(payload))
+        self.stats['messages'] += 1
+        self.stats['bytes'] += size
+        if self.rng.random() < profile.loss:
+            self.stats['dropped'] += 1
+            raise requests.exceptions.Timeout(dst)
+        # El enlace transmite los mensajes uno detrás de otro (cola de envío)
+        start = max(self.clock, self.__link_busy.get((src, dst), 0.0))
+        finished = start + size / float(profile.bandwidth)
+        self.__link_busy[(src, dst)] = finished
+        arrival = finished + profile.latency + self.rng.uniform(0, profile.jitter)
+        self.schedule(arrival - self.clock,
+                      lambda: self.__deliver(src, dst, path, payload))
+        return SimulatedResponse(202, elapsed=2 * profile.latency)
+
+    def request(self, src, dst, path):
+        """Responde de inmediato a una petición GET (la pérdida se traduce en un error de conexión)."""
+        if (dst not in self.nodes or dst in self.offline or
+                self.rng.random() < self.link(src, dst).loss):
+            self.stats['dropped'] += 1
+            raise requests.exceptions.ConnectionError(dst)
+        blockchain = self.nodes[dst].blockchain
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        if url.path == 'chain':
+            from_height = int(query.get('from_height', ['0'])[0])
+            data = _serialize_chain([block for block in blockchain.chain
+                                     if block.index >= from_height])
+        elif url.path == 'snapshot':
+            data = blockchain.get_snapshot()
+            if data is None:
+                return SimulatedResponse(404, {'message': 'No hay ninguna instantánea disponible.'})
+        elif url.path == 'block-transactions':
+            transactions = blockchain.get_block_transactions(
+                int(query['index'][0]), query.get('ids', [''])[0].split(','))
+            if transactions is None:
+                return SimulatedResponse(404, {'message': 'No se ha encontrado el bloque.'})
+            data = {'transactions': transactions}
+        else:
+            return SimulatedResponse(404, {'message': 'Ruta desconocida.'})
+        self.stats['messages'] += 1
+        self.stats['bytes'] += len(json.dumps(data))
+        return SimulatedResponse(200, data, 2 * self.link(src, dst).latency)
+
+    def __deliver(self, src, dst, path, values):
+        """Procesa un mensaje recibido igual que lo harían los endpoints de node.py."""
+        blockchain = self.nodes[dst].blockchain
+        if path == 'broadcast-transaction':
+            blockchain.add_transaction(
+                values['recipient'], values['sender'], values['signature'], values['amount'], is_receiving=True,
+                hops=values.get('hops', 0), scheme=values.get('scheme', DEFAULT_SCHEME))
+        elif path == 'broadcast-block':
+            self.__receive_block(src, blockchain, values)
+        self.__after_event(dst)
+
+    def __receive_block(self, src, blockchain, values):
+        block = values.get('block', values.get('compact_block'))
+        last_index = blockchain.chain[-1].index
+        if blockchain.is_known_block(block):
+            return
+        if block['index'] == last_index + 1:
+            if 'compact_block' in values:
+                block = blockchain.expand_compact_block(block, values.get('node'))
+                if block is None:
+                    blockchain.resolve_conflicts = True
+                    return
+            if not blockchain.add_block(block, values.get('hops', 0)):
+                # Respuesta 409 al emisor
+                self.nodes[src].blockchain.resolve_conflicts = True
+        elif block['index'] > last_index:
+            blockchain.resolve_conflicts = True
+        else:
+            self.nodes[src].blockchain.resolve_conflicts = True
+
+    def __after_event(self, address):
+        self.__observe(address)
+        if self.auto_resolve:
+            for other, node in self.nodes.items():
+                if node.blockchain.resolve_conflicts:
+                    node.blockchain.resolve()
+                    self.__observe(other)
+
+    def __observe(self, address):
+        """Registra los bloques que el nodo dado ve por primera vez."""
+        for block in reversed(self.nodes[address].blockchain.chain):
+            seen = self.block_seen.setdefault(hash_block(block), {})
+            if address in seen:
+                break
+            seen[address] = self.clock
+
+    def mine(self, address):
+        """El nodo dado mina un bloque con sus transacciones abiertas."""
+        blockchain = self.nodes[address].blockchain
+        block = blockchain.mine_block()
+        if block is not None:
+            self.mined_blocks[hash_block(block)] = (self.clock, address)
+        self.__after_event(address)
+        return block
+
+    def transact(self, address, amount=1.0):
+        """El nodo dado envía una transacción a otro nodo aleatorio si tiene saldo suficiente."""
+        node = self.nodes[address]
+        if node.blockchain.get_balance() < amount:
+            return False
+        recipient = self.nodes[self.rng.choice(
+            [other for other in self.nodes if other != address])]
+        signature = node.wallet.sign_transaction(
+            node.wallet.public_key, recipient.wallet.public_key, amount)
+        success = node.blockchain.add_transaction(
+            recipient.wallet.public_key, node.wallet.public_key, signature, amount,
+            scheme=node.wallet.scheme)
+        self.__after_event(address)
+        return success
+
+    def close(self):
+        """Cierra las blockchains de todos los nodos (y sus diarios de transacciones)."""
+        for node in self.nodes.values():
+            node.blockchain.close()
+
+    def sync(self):
+        """Ejecuta una ronda de sincronización (resolve) en todos los nodos."""
+        for address, node in self.nodes.items():
+            node.blockchain.resolve()
+            self.__observe(address)
+
+    def tips(self):
+        """Devuelve el hash del último bloque de cada nodo."""
+        return {address: hash_block(node.blockchain.chain[-1])
+                for address, node in self.nodes.items()}
+
+    def converged(self):
+        return not self.__events and len(set(self.tips().values())) == 1
+
+    def run_until(self, deadline):
+        """Procesa los eventos programados hasta el instante simulado indicado."""
+        while self.__events and self.__events[0][0] <= deadline:
+            at, _, action = heapq.heappop(self.__events)
+            self.clock = at
+            action()
+        self.clock = max(self.clock, deadline)
+
+    def run_workload(self, duration, tx_rate=2.0, block_interval=10.0,
+                     sync_interval=None, settle_timeout=120.0, hashrate=None):
+        """
+        Lanza una carga de transacciones y minado y devuelve las métricas obtenidas.
+
+        Argumentos:
+            :duration: Duración (simulada) de la carga en segundos.
+            :tx_rate: Transacciones por segundo en toda la red (llegadas de Poisson).
+            :block_interval: Intervalo medio entre bloques minados en toda la red.
+            :sync_interval: Si se indica, todos los nodos ejecutan resolve periódicamente.
+            :settle_timeout: Tiempo máximo de espera para la convergencia tras la carga.
+            :hashrate: Si se indica, intentos de Proof of Work por segundo de toda la red: el
+                       intervalo entre bloques depende entonces de la dificultad (en lugar de
+                       block_interval).
+        """
+        addresses = list(self.nodes)
+        start = self.clock
+        end = start + duration
+
+        def schedule_next(rate, action):
+            delay = self.rng.expovariate(rate)
+            if self.clock + delay <= end:
+                self.schedule(delay, lambda: (action(), schedule_next(rate, action)))
+
+        if tx_rate > 0:
+            schedule_next(tx_rate, lambda: self.transact(
+                self.rng.choice(addresses)))
+        if hashrate:
+            def schedule_mining():
+                # Tiempo esperado hasta el siguiente bloque: dificultad / intentos por segundo
+                miner = self.rng.choice(addresses)
+                blockchain = self.nodes[miner].blockchain
+                difficulty = blockchain.difficulty_policy.next_difficulty(blockchain.chain)
+                delay = self.rng.expovariate(hashrate / float(difficulty))
+                if self.clock + delay <= end:
+                    self.schedule(delay, lambda: (self.mine(miner), schedule_mining()))
+            schedule_mining()
+        else:
+            schedule_next(1.0 / block_interval,
+                          lambda: self.mine(self.rng.choice(addresses)))
+        if sync_interval:
+            def periodic_sync():
+                self.sync()
+                if self.clock + sync_interval <= end + settle_timeout:
+                    self.schedule(sync_interval, periodic_sync)
+            self.schedule(sync_interval, periodic_sync)
+        self.run_until(end)
+        # Fase de asentamiento: se espera a que todos los nodos converjan
+        converged_at = None
+        step = sync_interval or 1.0
+        while self.clock < end + settle_timeout:
+            if len(set(self.tips().values())) == 1 and not self.__pending_messages():
+                converged_at = self.clock
+                break
+            self.run_until(self.clock + step)
+        else:
+            if len(set(self.tips().values())) == 1:
+                converged_at = self.clock
+        return self.report(start, end, converged_at)
+
+    def __pending_messages(self):
+        # Los eventos de sincronización periódica no cuentan como mensajes en vuelo
+        return any(getattr(action, '__name__', '') != 'periodic_sync'
+                   for _, _, action in self.__events)
+
+    def report(self, start, end, converged_at):
+        """Calcula las métricas de la simulación."""
+        final_chain = next(iter(self.nodes.values())).blockchain.chain
+        final_hashes = set(hash_block(block) for block in final_chain)
+        node_count = len(self.nodes)
+        full_delays = []
+        half_delays = []
+        for block_hash, (mined_at, _) in self.mined_blocks.items():
+            if block_hash not in final_hashes:
+                continue
+            delays = sorted(seen_at - mined_at
+                            for seen_at in self.block_seen.get(block_hash, {}).values())
+            if len(delays) >= node_count:
+                full_delays.append(delays[-1])
+            if len(delays) >= (node_count + 1) // 2:
+                half_delays.append(delays[(node_count + 1) // 2 - 1])
+        mined = len(self.mined_blocks)
+        orphaned = len([block_hash for block_hash in self.mined_blocks
+                        if block_hash not in final_hashes])
+        intervals = [block.timestamp - previous.timestamp
+                     for previous, block in zip(final_chain[1:], final_chain[2:])]
+        return {
+            'nodes': node_count,
+            'blocks_mined': mined,
+            'blocks_orphaned': orphaned,
+            'orphan_ratio': orphaned / float(mined) if mined else 0.0,
+            'final_height': final_chain[-1].index,
+            'final_difficulty': final_chain[-1].difficulty,
+            'mean_block_interval': sum(intervals) / len(intervals) if intervals else None,
+            # Los bloques podados no conservan sus transacciones
+            'confirmed_transactions': sum(len(block.transactions) - 1
+                                          for block in final_chain[1:] if block.transactions),
+            'propagation_p50_half': _percentile(half_delays, 0.5),
+            'propagation_p50_full': _percentile(full_delays, 0.5),
+            'propagation_p90_full': _percentile(full_delays, 0.9),
+            'convergence_time': None if converged_at is None else converged_at - end,
+            'messages': self.stats['messages'],
+            'bytes': self.stats['bytes'],
+            'dropped': self.stats['dropped'],
+        }
+
+
+def simulate(nodes=5, topology='mesh', degree=3, latency=0.05, jitter=0.01,
+             bandwidth=1000000, loss=0.0, duration=120.0, tx_rate=2.0,
+             block_interval=10.0, sync_interval=None, seed=None, propagation='direct',
+             fanout=None, max_hops=None, prune_depth=None, scheme=DEFAULT_SCHEME,
+             target_block_time=None, retarget_interval=RETARGET_INTERVAL, hashrate=None):
+    """Construye una red simulada, ejecuta la carga y devuelve las métricas."""
+    # La selección aleatoria de homólogos en modo gossip usa el módulo random
+    random.seed(seed)
+    network = SimulatedNetwork(seed=seed, default_link=LinkProfile(
+        latency, jitter, bandwidth, loss), propagation=propagation, prune_depth=prune_depth,
+        scheme=scheme, difficulty_policy=DifficultyPolicy(
+            target_block_time or block_interval, retarget_interval))
+    addresses = ['sim-{}'.format(i) for i in range(nodes)]
+    for address in addresses:
+        node = network.add_node(address)
+        if fanout is not None:
+            node.blockchain.gossip_fanout = fanout
+        if max_hops is not None:
+            node.blockchain.gossip_max_hops = max_hops
+    for a, b in sorted(build_topology(topology, addresses, degree, network.rng)):
+        network.connect(a, b)
+    try:
+        return network.run_workload(duration, tx_rate, block_interval, sync_interval,
+                                    hashrate=hashrate)
+    finally:
+        network.close()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--nodes', type=int, default=5)
+    parser.add_argument('--topology', default='mesh',
+                        choices=['mesh', 'ring', 'star', 'random'])
+    parser.add_argument('--degree', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--bandwidth', type=float, default=1000000)
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--duration', type=float, default=120.0)
+    parser.add_argument('--tx-rate', type=float, default=2.0)
+    parser.add_argument('--block-interval', type=float, default=10.0)
+    parser.add_argument('--sync-interval', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--propagation', default='direct',
+                        choices=['direct', 'gossip'])
+    parser.add_argument('--fanout', type=int, default=None)
+    parser.add_argument('--max-hops', type=int, default=None)
+    parser.add_argument('--prune-depth', type=int, default=None)
+    parser.add_argument('--scheme', default=DEFAULT_SCHEME, choices=sorted(SCHEMES))
+    parser.add_argument('--target-block-time', type=float, default=None,
+                        help='Intervalo objetivo entre bloques (por defecto, --block-interval)')
+    parser.add_argument('--retarget-interval', type=int, default=RETARGET_INTERVAL)
+    parser.add_argument('--hashrate', type=float, default=None,
+                        help='Intentos de Proof of Work por segundo de toda la red')
+    args = parser.parse_args()
+    # Los nodos guardan sus datos en el directorio actual: se usa uno temporal
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.chdir(data_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics = simulate(args.nodes, args.topology, args.degree, args.latency,
+                               args.jitter, args.bandwidth, args.loss, args.duration,
+                               args.tx_rate, args.block_interval, args.sync_interval,
+                               args.seed, args.propagation, args.fanout, args.max_hops,
+                               args.prune_depth, args.scheme, args.target_block_time,
+                               args.retarget_interval, args.hashrate)
+    for key, value in metrics.items():
+        print('{}: {}'.format(key, value))
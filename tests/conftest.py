@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Los nodos guardan sus archivos en el directorio actual: cada prueba usa uno temporal."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,51 @@
+from block import Block
+from transaction import Transaction
+from utility.address_index import AddressIndex
+
+
+def _index(timestamps, address='alice'):
+    index = AddressIndex()
+    for height, timestamp in enumerate(timestamps):
+        tx = Transaction(address, 'bob', 'sig{}'.format(height), 1.0)
+        index.block_applied(Block(height, '', [tx], 0, timestamp))
+    return index
+
+
+def test_pages_newest_first():
+    index = _index([0, 10, 20, 30, 40])
+    page, total = index.lookup('alice', page=1, page_size=2)
+    assert total == 5
+    assert page == [(4, 0), (3, 0)]
+    page, _ = index.lookup('alice', page=3, page_size=2)
+    assert page == [(0, 0)]
+    assert index.lookup('alice', page=4, page_size=2) == ([], 5)
+
+
+def test_height_filters():
+    index = _index([0, 10, 20, 30, 40])
+    page, total = index.lookup('alice', from_height=1, to_height=3)
+    assert total == 3
+    assert page == [(3, 0), (2, 0), (1, 0)]
+
+
+def test_time_filters_with_timestamps_going_backwards():
+    # La regla de la mediana permite que un bloque tenga una marca anterior a la del previo
+    index = _index([0, 100, 50, 60, 200, 70])
+    page, total = index.lookup('alice', since=55, until=80)
+    assert total == 2
+    assert page == [(5, 0), (3, 0)]
+    page, total = index.lookup('alice', until=60)
+    assert page == [(3, 0), (2, 0), (0, 0)]
+    page, total = index.lookup('alice', since=150)
+    assert page == [(4, 0)]
+    assert index.lookup('alice', since=500) == ([], 0)
+
+
+def test_undo_and_prune():
+    index = _index([0, 10, 20, 30])
+    index.block_undone(Block(3, '', [Transaction('alice', 'bob', 'sig3', 1.0)], 0, 30))
+    assert index.count('alice') == 3
+    index.prune(1)
+    page, total = index.lookup('alice', since=0)
+    assert page == [(2, 0)]
+    assert total == 1
@@ -0,0 +1,58 @@
+from simulator import SimulatedNetwork
+from transaction import Transaction
+from block import Block
+from utility.compact_block import compact_block, compact_block_id, short_id, SHORT_ID_LENGTH
+from utility.hash_util import hash_block
+
+
+def test_compact_block_keeps_header_and_reward():
+    transactions = [Transaction('alice', 'bob', 'sig', 1.0),
+                    Transaction('RECOMPENSA_MINADO', 'miner', '', 10)]
+    block = Block(3, 'previous', transactions, 42, 1000.0)
+    compact = compact_block(block)
+    assert compact['index'] == 3 and compact['proof'] == 42
+    assert compact['short_ids'] == [short_id(transactions[0])]
+    assert len(compact['short_ids'][0]) == SHORT_ID_LENGTH
+    assert compact['reward']['recipient'] == 'miner'
+    assert 'transactions' not in compact
+    block.proof = 43
+    assert compact_block_id(compact_block(block)) != compact_block_id(compact)
+
+
+def _pay(network, sender, recipient, amount):
+    sender, recipient = network.nodes[sender], network.nodes[recipient]
+    signature = sender.wallet.sign_transaction(
+        sender.wallet.public_key, recipient.wallet.public_key, amount)
+    assert sender.blockchain.add_transaction(
+        recipient.wallet.public_key, sender.wallet.public_key, signature, amount)
+
+
+def test_block_is_rebuilt_from_mempool_and_missing_transactions_fetched():
+    network = SimulatedNetwork(seed=1, auto_resolve=False)
+    a = network.add_node('a').blockchain
+    b = network.add_node('b').blockchain
+    network.connect('a', 'b')
+    network.mine('a')
+    network.run_until(1.0)
+    # 'b' recibe la primera transacción; la segunda sólo la conoce 'a'
+    _pay(network, 'a', 'b', 1.0)
+    network.run_until(2.0)
+    assert len(b.get_open_transactions()) == 1
+    a.remove_peer_node('b')
+    _pay(network, 'a', 'b', 2.0)
+    a.add_peer_node('b')
+    network.mine('a')
+    network.run_until(3.0)
+    assert hash_block(b.chain[-1]) == hash_block(a.chain[-1])
+    assert [tx.amount for tx in b.chain[-1].transactions[:-1]] == [1.0, 2.0]
+    assert b.get_open_transactions() == []
+
+
+def test_missing_transactions_without_sender_fail():
+    network = SimulatedNetwork(seed=1, auto_resolve=False)
+    a = network.add_node('a').blockchain
+    b = network.add_node('b').blockchain
+    network.mine('a')
+    _pay(network, 'a', 'b', 1.0)
+    block = network.mine('a')
+    assert b.expand_compact_block(compact_block(block)) is None
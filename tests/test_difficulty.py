@@ -0,0 +1,185 @@
+import json
+
+import pytest
+
+from block import Block
+from blockchain import Blockchain
+from simulator import SimulatedNetwork, SimulatedResponse, _serialize_chain
+from transaction import Transaction
+from utility.difficulty import (DifficultyPolicy, INITIAL_DIFFICULTY, MAX_ADJUSTMENT,
+                                MAX_FUTURE_BLOCK_TIME, chain_work)
+from utility.hash_util import hash_block
+from utility.verification import Verification
+
+
+def _mine(chain, timestamp, difficulty):
+    """Añade a la cadena un bloque con una Proof of Work válida."""
+    previous_hash = hash_block(chain[-1])
+    transactions = [Transaction('RECOMPENSA_MINADO', 'miner', '', 10)]
+    proof = 0
+    while not Verification.valid_proof([], previous_hash, proof,
+                                       difficulty or INITIAL_DIFFICULTY):
+        proof += 1
+    chain.append(Block(chain[-1].index + 1, previous_hash, transactions, proof, timestamp,
+                       difficulty))
+
+
+def _legacy_chain(length, timestamp=1000.0):
+    """Cadena como las anteriores a guardar la dificultad (todas con la misma marca)."""
+    chain = [Block(0, '', [], 100, 0, None)]
+    for _ in range(length):
+        _mine(chain, timestamp, None)
+    return chain
+
+
+def _timed_chain(intervals, difficulty=INITIAL_DIFFICULTY):
+    """Bloques sin minar con los intervalos dados (para calcular la dificultad esperada)."""
+    chain = [Block(0, '', [], 100, 0)]
+    timestamp = 1000.0
+    for interval in intervals:
+        timestamp += interval
+        chain.append(Block(chain[-1].index + 1, '', [], 0, timestamp, difficulty))
+    return chain
+
+
+def _retargeted_chain(length, interval, policy):
+    """Cadena minada con la dificultad que exige la regla y un intervalo fijo entre bloques."""
+    chain = [Block(0, '', [], 100, 0)]
+    for _ in range(length):
+        _mine(chain, 1000.0 + chain[-1].index * interval, policy.next_difficulty(chain))
+    return chain
+
+
+def test_difficulty_is_kept_between_retargets():
+    policy = DifficultyPolicy(10.0, 10)
+    assert policy.next_difficulty(_timed_chain([1.0] * 5)) == INITIAL_DIFFICULTY
+
+
+@pytest.mark.parametrize('interval, expected', [
+    (10.0, INITIAL_DIFFICULTY),
+    (5.0, INITIAL_DIFFICULTY * 2),
+    (20.0, INITIAL_DIFFICULTY // 2),
+    (0.1, INITIAL_DIFFICULTY * MAX_ADJUSTMENT),
+    (1000.0, INITIAL_DIFFICULTY // MAX_ADJUSTMENT),
+])
+def test_retarget_follows_block_time(interval, expected):
+    policy = DifficultyPolicy(10.0, 10)
+    assert policy.next_difficulty(_timed_chain([interval] * 9)) == expected
+
+
+def test_timestamp_must_exceed_median():
+    chain = _timed_chain([10.0] * 11)
+    median = DifficultyPolicy.min_timestamp(chain)
+    assert median == chain[6].timestamp
+    assert DifficultyPolicy.valid_timestamp(chain, timestamp=median)
+    assert not DifficultyPolicy.valid_timestamp(chain, timestamp=median - 1)
+
+
+def test_legacy_chain_verifies_and_extends():
+    chain = _legacy_chain(12)
+    policy = DifficultyPolicy(10.0, 10)
+    assert Verification.verify_chain(chain, policy)
+    # El primer ajuste con bloques sin dificultad en la ventana mantiene la inicial
+    difficulty = policy.next_difficulty(chain)
+    assert difficulty == INITIAL_DIFFICULTY
+    _mine(chain, 2000.0, difficulty)
+    assert Verification.verify_chain(chain, policy)
+
+
+def test_legacy_blocks_only_at_the_start():
+    chain = _legacy_chain(2)
+    _mine(chain, 2000.0, INITIAL_DIFFICULTY)
+    _mine(chain, 2000.0, None)
+    assert not Verification.verify_chain(chain)
+
+
+def test_legacy_height_limit():
+    chain = _legacy_chain(5)
+    assert Verification.verify_chain(chain, DifficultyPolicy(legacy_height=5))
+    assert not Verification.verify_chain(chain, DifficultyPolicy(legacy_height=4))
+
+
+def test_tampered_difficulty_is_rejected():
+    chain = _legacy_chain(2)
+    _mine(chain, 2000.0, INITIAL_DIFFICULTY // 2)
+    assert not Verification.verify_chain(chain)
+
+
+def test_new_node_syncs_from_legacy_node():
+    chain = _legacy_chain(12)
+    saved = []
+    for block in chain:
+        data = dict(block.__dict__, transactions=[tx.__dict__ for tx in block.transactions])
+        del data['difficulty']
+        saved.append(data)
+    with open('blockchain-a.txt', mode='w') as f:
+        f.write(json.dumps(saved) + '\n[]\n[]')
+    network = SimulatedNetwork(seed=1, auto_resolve=False)
+    a = network.add_node('a').blockchain
+    b = network.add_node('b').blockchain
+    assert len(a.chain) == 13
+    network.connect('a', 'b')
+    assert b.resolve()
+    assert hash_block(b.chain[-1]) == hash_block(a.chain[-1])
+    # La cadena sigue creciendo con la dificultad en la cabecera
+    block = network.mine('b')
+    assert block.difficulty == INITIAL_DIFFICULTY
+    network.run_until(1.0)
+    assert len(a.chain) == 14
+
+
+def test_future_timestamps_are_rejected():
+    policy = DifficultyPolicy(10.0, 10)
+    # Cada bloque se adelanta 1e6 s: cada ajuste divide la dificultad por MAX_ADJUSTMENT
+    chain = _retargeted_chain(30, 1e6, policy)
+    assert chain[-1].difficulty < INITIAL_DIFFICULTY // MAX_ADJUSTMENT ** 2
+    assert Verification.verify_chain(chain, policy)
+    assert not Verification.verify_chain(chain, policy, now=2000.0)
+    assert Verification.verify_chain(chain, policy,
+                                     now=chain[-1].timestamp - MAX_FUTURE_BLOCK_TIME)
+
+
+class _ChainTransport:
+    """Transporte en el que el único homólogo sirve una cadena fija."""
+
+    def __init__(self, chain, clock):
+        self.chain = chain
+        self.clock = clock
+
+    def now(self):
+        return self.clock
+
+    def get(self, node, path, timeout=None):
+        return SimulatedResponse(200, _serialize_chain(self.chain))
+
+    def post(self, node, path, payload, timeout=None):
+        return SimulatedResponse(200)
+
+
+def _node_with_chain(chain, transport):
+    with open('blockchain-work.txt', mode='w') as f:
+        f.write(json.dumps(_serialize_chain(chain)) + '\n[]\n[]')
+    blockchain = Blockchain(None, 'work', transport,
+                            difficulty_policy=DifficultyPolicy(10.0, 10))
+    blockchain.add_peer_node('peer')
+    return blockchain
+
+
+def test_resolve_prefers_most_work_over_length():
+    policy = DifficultyPolicy(10.0, 10)
+    honest = _retargeted_chain(15, 10.0, policy)
+    # Más larga pero con marcas de tiempo muy separadas (y en el pasado): pesa menos
+    cheap = _retargeted_chain(30, 1e6, policy)
+    assert len(cheap) > len(honest)
+    assert chain_work(cheap) < chain_work(honest)
+    transport = _ChainTransport(cheap, clock=cheap[-1].timestamp)
+    blockchain = _node_with_chain(honest, transport)
+    assert not blockchain.resolve()
+    assert hash_block(blockchain.chain[-1]) == hash_block(honest[-1])
+    # Una cadena con más trabajo sí sustituye a la local
+    heavier = honest[:]
+    _mine(heavier, heavier[-1].timestamp + 10.0, policy.next_difficulty(heavier))
+    transport.chain = heavier
+    assert blockchain.resolve()
+    assert hash_block(blockchain.chain[-1]) == hash_block(heavier[-1])
+    blockchain.close()
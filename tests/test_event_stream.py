@@ -0,0 +1,112 @@
+import socket
+import time
+
+import pytest
+
+from blockchain import Blockchain
+from utility.event_stream import EventHub, ChainEvents
+from wallet import Wallet
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def hub():
+    hub = EventHub('127.0.0.1', _free_port())
+    hub.start()
+    return hub
+
+
+def _subscribe(hub, last_event_id=None, path='/events'):
+    connection = socket.create_connection(('127.0.0.1', hub.port), timeout=2)
+    request = 'GET {} HTTP/1.1\r\n'.format(path)
+    if last_event_id is not None:
+        request += 'Last-Event-ID: {}\r\n'.format(last_event_id)
+    connection.sendall((request + '\r\n').encode())
+    return connection
+
+
+def _read_until(connection, marker):
+    data = b''
+    while marker not in data:
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _events(data):
+    """Devuelve los pares (id, evento) de los mensajes completos recibidos."""
+    events = []
+    for message in data.split(b'\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.decode().splitlines()
+                      if ': ' in line)
+        if 'event' in fields:
+            events.append((fields.get('id'), fields['event']))
+    return events
+
+
+def _wait_subscribers(hub, count):
+    deadline = time.time() + 2
+    while hub.stats()['subscribers'] < count and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_live_events_and_replay(hub):
+    connection = _subscribe(hub)
+    _read_until(connection, b'retry')
+    _wait_subscribers(hub, 1)
+    hub.publish('first', {'n': 1})
+    first_id = int(_events(_read_until(connection, b'first'))[0][0])
+    connection.close()
+    hub.publish('second', {'n': 2})
+    hub.publish('third', {'n': 3})
+    # Al reconectarse con Last-Event-ID recibe los eventos que se perdió
+    connection = _subscribe(hub, first_id)
+    received = _events(_read_until(connection, b'third'))
+    connection.close()
+    assert [event for _, event in received] == ['second', 'third']
+
+
+def test_unknown_event_id_sends_reset(hub):
+    connection = _subscribe(hub, 10 ** 6)
+    data = _read_until(connection, b'reset')
+    connection.close()
+    assert (None, 'reset') in _events(data)
+
+
+def test_other_paths_are_not_found(hub):
+    connection = _subscribe(hub, path='/chain')
+    assert _read_until(connection, b'\r\n').startswith(b'HTTP/1.1 404')
+    connection.close()
+
+
+class RecordingHub:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event, data):
+        self.events.append((event, data))
+
+
+def test_chain_events():
+    wallet = Wallet(1, 'ed25519')
+    wallet.create_keys()
+    blockchain = Blockchain(wallet.public_key, 'events')
+    recording = RecordingHub()
+    blockchain.add_observer(ChainEvents(recording), replay=False)
+    blockchain.mine_block()
+    signature = wallet.sign_transaction(wallet.public_key, 'bob', 1.0)
+    blockchain.add_transaction('bob', wallet.public_key, signature, 1.0, scheme='ed25519')
+    blockchain.mine_block()
+    blockchain.add_peer_node('localhost:5001')
+    names = [event for event, _ in recording.events]
+    assert names == ['block', 'transaction_added', 'block', 'transactions_removed', 'peers']
+    assert recording.events[2][1]['index'] == 2
+    assert recording.events[2][1]['transactions'] == 2
+    blockchain.close()
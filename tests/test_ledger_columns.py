@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from block import Block
+from transaction import Transaction
+from utility.ledger_columns import LedgerColumns, MINING_SENDER, INITIAL_CAPACITY
+
+
+def _block(index, transfers, miner='miner'):
+    transactions = [Transaction(sender, recipient, '', amount)
+                    for sender, recipient, amount in transfers]
+    transactions.append(Transaction(MINING_SENDER, miner, '', 10))
+    return Block(index, '', transactions, 0, index)
+
+
+def _ledger(blocks):
+    ledger = LedgerColumns()
+    for block in blocks:
+        ledger.block_applied(block)
+    return ledger
+
+
+def test_balances_match_a_python_sum():
+    rng = random.Random(1)
+    addresses = ['a', 'b', 'c', 'd']
+    blocks = [_block(index, [(rng.choice(addresses), rng.choice(addresses),
+                              round(rng.uniform(0, 5), 2)) for _ in range(50)],
+                     rng.choice(addresses))
+              for index in range(1, 60)]
+    expected = {}
+    for block in blocks:
+        for tx in block.transactions:
+            if tx.sender != MINING_SENDER:
+                expected[tx.sender] = expected.get(tx.sender, 0) - tx.amount
+            expected[tx.recipient] = expected.get(tx.recipient, 0) + tx.amount
+    ledger = _ledger(blocks)
+    # Las columnas han crecido por encima de la capacidad inicial
+    assert len(ledger) > INITIAL_CAPACITY
+    balances = ledger.balance_map()
+    assert set(balances) == set(expected)
+    for address, amount in expected.items():
+        assert balances[address] == pytest.approx(amount)
+
+
+def test_balances_up_to_height_and_undo():
+    blocks = [_block(1, []), _block(2, [('miner', 'alice', 4.0)])]
+    ledger = _ledger(blocks)
+    assert ledger.balance_map(to_height=1) == {'miner': 10.0, 'alice': 0.0}
+    assert ledger.balance_map() == {'miner': 16.0, 'alice': 4.0}
+    ledger.block_undone(blocks[1])
+    assert ledger.balance_map() == {'miner': 10.0, 'alice': 0.0}
+
+
+def test_top_holders():
+    ledger = _ledger([_block(1, [], 'a'), _block(2, [('a', 'b', 3.0)], 'a'),
+                      _block(3, [], 'c')])
+    assert ledger.top_holders(2) == [('a', 17.0), ('c', 10.0)]
+    assert ledger.top_holders(10)[-1] == ('b', 3.0)
+
+
+def test_flow_totals():
+    ledger = _ledger([_block(1, [('x', 'y', 1.0)]), _block(2, []),
+                      _block(3, [('x', 'y', 2.0), ('y', 'x', 0.5)])])
+    flows = ledger.flow_totals(2, 3)
+    assert flows['minted'] == 20.0
+    assert flows['transferred'] == 2.5
+    assert flows['transactions'] == 2
+    assert flows['transferred_per_block'] == {2: 0.0, 3: 2.5}
+
+
+def test_drop_until_keeps_balances_in_base():
+    blocks = [_block(1, []), _block(2, [('miner', 'alice', 4.0)]), _block(3, [])]
+    ledger = _ledger(blocks)
+    balances = ledger.balance_map(2)
+    ledger.set_base_balances(balances)
+    ledger.drop_until(2)
+    assert len(ledger) == 1
+    assert ledger.balance_map() == {'miner': 26.0, 'alice': 4.0}
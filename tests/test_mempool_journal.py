@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+from blockchain import Blockchain
+from transaction import Transaction
+from utility.mempool_journal import MempoolJournal
+from wallet import Wallet
+
+
+def _tx(amount):
+    return Transaction('alice', 'bob', 'sig{}'.format(amount), amount)
+
+
+@pytest.mark.parametrize('mode', ['sync', 'batch'])
+def test_replay_after_close(mode):
+    journal = MempoolJournal('n', mode)
+    for amount in (1.0, 2.0, 3.0):
+        journal.append(_tx(amount))
+    journal.close()
+    replayed = MempoolJournal('n').replay()
+    assert [tx['amount'] for tx in replayed] == [1.0, 2.0, 3.0]
+
+
+def test_sync_mode_is_durable_without_close():
+    journal = MempoolJournal('n', 'sync')
+    journal.append(_tx(1.0))
+    assert journal.syncs == 1
+    with open('mempool-n.journal') as f:
+        assert len(f.readlines()) == 1
+    journal.close()
+
+
+def test_batch_mode_flushes_full_batches():
+    journal = MempoolJournal('n', 'batch', fsync_interval=60, batch_size=3)
+    journal.append(_tx(1.0))
+    journal.append(_tx(2.0))
+    with open('mempool-n.journal') as f:
+        assert f.read() == ''
+    journal.append(_tx(3.0))
+    with open('mempool-n.journal') as f:
+        assert len(f.readlines()) == 3
+    journal.close()
+
+
+def test_flush_thread_starts_with_first_batch_append():
+    before = threading.active_count()
+    journal = MempoolJournal('n', 'batch', fsync_interval=0.01)
+    assert threading.active_count() == before
+    journal.append(_tx(1.0))
+    assert threading.active_count() == before + 1
+    journal.close()
+
+
+def test_reset_truncates():
+    journal = MempoolJournal('n', 'sync')
+    journal.append(_tx(1.0))
+    journal.reset()
+    journal.append(_tx(2.0))
+    assert [tx['amount'] for tx in journal.replay()] == [2.0]
+    journal.close()
+
+
+def test_torn_last_line_is_dropped_and_trimmed():
+    journal = MempoolJournal('n', 'sync')
+    journal.append(_tx(1.0))
+    journal.close()
+    with open('mempool-n.journal', 'a') as f:
+        f.write('{"sender": "ali')
+    journal = MempoolJournal('n', 'sync')
+    assert [tx['amount'] for tx in journal.replay()] == [1.0]
+    journal.append(_tx(2.0))
+    journal.close()
+    assert [tx['amount'] for tx in MempoolJournal('n').replay()] == [1.0, 2.0]
+
+
+def test_append_after_close_is_ignored():
+    journal = MempoolJournal('n', 'sync')
+    journal.close()
+    journal.append(_tx(1.0))
+    assert MempoolJournal('n').replay() == []
+
+
+def test_blockchain_restores_open_transactions_after_crash():
+    wallet = Wallet(1, 'ed25519')
+    wallet.create_keys()
+    blockchain = Blockchain(wallet.public_key, 'n', mempool_durability='sync')
+    blockchain.mine_block()
+    for amount in (1.0, 2.0):
+        signature = wallet.sign_transaction(wallet.public_key, 'bob', amount)
+        assert blockchain.add_transaction('bob', wallet.public_key, signature, amount,
+                                          scheme='ed25519')
+    # Sin close ni save_data: como si el proceso hubiera caído
+    restarted = Blockchain(wallet.public_key, 'n')
+    assert [tx.amount for tx in restarted.get_open_transactions()] == [1.0, 2.0]
+    # Minar guarda el estado completo y vacía el diario
+    restarted.mine_block()
+    with open('mempool-n.journal') as f:
+        assert f.read() == ''
+    restarted.close()
+    blockchain.close()
+    restarted = Blockchain(wallet.public_key, 'n')
+    assert restarted.get_open_transactions() == []
+    restarted.close()
+
+
+def test_identical_payments_survive_restart():
+    wallet = Wallet(1, 'ed25519')
+    wallet.create_keys()
+    blockchain = Blockchain(wallet.public_key, 'n', mempool_durability='sync')
+    blockchain.mine_block()
+    signature = wallet.sign_transaction(wallet.public_key, 'bob', 1.0)
+    for _ in range(3):
+        assert blockchain.add_transaction('bob', wallet.public_key, signature, 1.0,
+                                          scheme='ed25519')
+    restarted = Blockchain(wallet.public_key, 'n')
+    assert len(restarted.get_open_transactions()) == 3
+    restarted.close()
+    blockchain.close()
+
+
+def test_journal_already_in_state_file_is_not_replayed(monkeypatch):
+    wallet = Wallet(1, 'ed25519')
+    wallet.create_keys()
+    blockchain = Blockchain(wallet.public_key, 'n', mempool_durability='sync')
+    blockchain.mine_block()
+    signature = wallet.sign_transaction(wallet.public_key, 'bob', 1.0)
+    assert blockchain.add_transaction('bob', wallet.public_key, signature, 1.0,
+                                      scheme='ed25519')
+    # Caída después de guardar el estado y antes de vaciar el diario
+    monkeypatch.setattr(blockchain._Blockchain__journal, 'reset', lambda: None)
+    blockchain.save_data()
+    restarted = Blockchain(wallet.public_key, 'n', mempool_durability='sync')
+    assert len(restarted.get_open_transactions()) == 1
+    # Las nuevas entradas sí se recuperan aunque sigan detrás de las antiguas
+    assert restarted.add_transaction('bob', wallet.public_key, signature, 1.0,
+                                     scheme='ed25519')
+    again = Blockchain(wallet.public_key, 'n')
+    assert len(again.get_open_transactions()) == 2
+    again.close()
+    restarted.close()
+    blockchain.close()
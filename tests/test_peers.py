@@ -0,0 +1,80 @@
+from blockchain import Blockchain
+from utility.peers import PeerTable, BASE_BACKOFF, MAX_BACKOFF, EVICT_AFTER_SECONDS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_failures_back_off_exponentially():
+    clock = FakeClock()
+    peers = PeerTable(clock)
+    peers.add('a')
+    peers.record_failure('a')
+    assert peers.ranked() == []
+    clock.now += BASE_BACKOFF
+    assert peers.ranked() == ['a']
+    peers.record_failure('a')
+    clock.now += BASE_BACKOFF
+    assert peers.ranked() == []
+    clock.now += BASE_BACKOFF
+    assert peers.ranked() == ['a']
+
+
+def test_backoff_is_capped():
+    clock = FakeClock()
+    peers = PeerTable(clock)
+    peers.add('a')
+    for _ in range(5):
+        peers.record_failure('a')
+    # Sin expulsión (no ha pasado el tiempo mínimo): la espera nunca supera el máximo
+    for _ in range(20):
+        peers.record_failure('a')
+    clock.now += MAX_BACKOFF
+    assert peers.ranked() == ['a']
+
+
+def test_success_resets_backoff_and_ranks_by_latency():
+    clock = FakeClock()
+    peers = PeerTable(clock)
+    peers.add('slow')
+    peers.add('fast')
+    peers.add('failing')
+    peers.record_success('slow', 0.5)
+    peers.record_success('fast', 0.1)
+    peers.record_failure('failing')
+    assert peers.ranked() == ['fast', 'slow']
+    peers.record_success('failing', 0.2)
+    assert peers.ranked() == ['fast', 'failing', 'slow']
+
+
+def test_dead_peer_is_evicted():
+    clock = FakeClock()
+    peers = PeerTable(clock)
+    peers.add('a')
+    evicted = False
+    for _ in range(20):
+        clock.now += EVICT_AFTER_SECONDS / 10
+        evicted = peers.record_failure('a')
+        if evicted:
+            break
+    assert evicted
+    assert 'a' not in peers
+
+
+def test_remove_peer_node():
+    blockchain = Blockchain(None, 'peers')
+    blockchain.add_peer_node('localhost:5001')
+    blockchain.add_peer_node('localhost:5002')
+    blockchain.remove_peer_node('localhost:5001')
+    assert blockchain.get_peer_nodes() == ['localhost:5002']
+    # Quitar un nodo desconocido no es un error
+    blockchain.remove_peer_node('localhost:5003')
+    blockchain.close()
+    restarted = Blockchain(None, 'peers')
+    assert restarted.get_peer_nodes() == ['localhost:5002']
+    restarted.close()
@@ -0,0 +1,47 @@
+from simulator import SimulatedNetwork
+from blockchain import Blockchain
+from utility.hash_util import hash_block
+from utility.verification import Verification
+
+
+def _network(prune_depth=3, blocks=8):
+    network = SimulatedNetwork(seed=1, auto_resolve=False, prune_depth=prune_depth)
+    network.add_node('a')
+    for _ in range(blocks):
+        network.mine('a')
+    return network
+
+
+def test_old_bodies_are_replaced_by_headers():
+    network = _network()
+    blockchain = network.nodes['a'].blockchain
+    chain = blockchain.chain
+    assert blockchain.pruned_height == 5
+    assert blockchain.get_base_height() == 5
+    assert all(getattr(block, 'pruned', False) for block in chain[1:6])
+    assert not any(getattr(block, 'pruned', False) for block in chain[6:])
+    # Las cabeceras conservan los enlaces de la cadena
+    for previous, block in zip(chain, chain[1:]):
+        assert block.previous_hash == hash_block(previous)
+    assert Verification.verify_chain(chain, blockchain.difficulty_policy, start=5)
+
+
+def test_balances_survive_pruning_and_restart():
+    network = _network()
+    node = network.nodes['a']
+    assert node.blockchain.get_balance() == 80.0
+    page, total = node.blockchain.address_index.lookup(node.wallet.public_key)
+    assert total == 3
+    node.blockchain.close()
+    restarted = Blockchain(node.wallet.public_key, 'a', prune_depth=3)
+    assert restarted.get_balance() == 80.0
+    assert restarted.pruned_height == 5
+    restarted.close()
+
+
+def test_unpruned_node_keeps_every_body():
+    network = _network(prune_depth=None)
+    blockchain = network.nodes['a'].blockchain
+    assert blockchain.pruned_height is None
+    assert not blockchain.is_pruned()
+    assert not any(getattr(block, 'pruned', False) for block in blockchain.chain)
@@ -0,0 +1,66 @@
+from simulator import SimulatedNetwork
+from utility.hash_util import hash_block
+
+
+def _diverge():
+    """
+    'a' y 'b' comparten el bloque 1 (minado por 'a') y después se separan: 'a' mina un bloque
+    con un pago a 'b' y 'b' mina dos bloques, así que su rama es la más larga.
+    """
+    network = SimulatedNetwork(seed=1, auto_resolve=False)
+    network.add_node('a')
+    network.add_node('b')
+    network.connect('a', 'b')
+    network.mine('a')
+    network.run_until(1.0)
+    a = network.nodes['a']
+    b = network.nodes['b']
+    assert len(b.blockchain.chain) == 2
+    a.blockchain.remove_peer_node('b')
+    b.blockchain.remove_peer_node('a')
+    signature = a.wallet.sign_transaction(a.wallet.public_key, b.wallet.public_key, 1.0)
+    assert a.blockchain.add_transaction(b.wallet.public_key, a.wallet.public_key, signature, 1.0)
+    network.mine('a')
+    network.mine('b')
+    network.mine('b')
+    a.blockchain.add_peer_node('b')
+    return network, a, b
+
+
+def test_find_fork_point():
+    network, a, b = _diverge()
+    assert a.blockchain.find_fork_point(a.blockchain.chain, b.blockchain.chain) == 1
+
+
+def test_resolve_switches_to_longer_branch():
+    network, a, b = _diverge()
+    assert a.blockchain.resolve()
+    assert hash_block(a.blockchain.chain[-1]) == hash_block(b.blockchain.chain[-1])
+    # El pago del bloque huérfano sigue siendo válido en la nueva rama: vuelve a estar abierto
+    open_transactions = a.blockchain.get_open_transactions()
+    assert [tx.amount for tx in open_transactions] == [1.0]
+    assert a.blockchain.get_balance() == 9.0
+    # Los observadores (libro en columnas e índice por dirección) siguen a la nueva rama
+    assert a.blockchain.ledger.balance_map() == b.blockchain.ledger.balance_map()
+    page, total = a.blockchain.address_index.lookup(b.wallet.public_key)
+    assert total == 2
+    assert [height for height, _ in page] == [3, 2]
+
+
+def test_shorter_branch_is_kept():
+    network, a, b = _diverge()
+    b.blockchain.add_peer_node('a')
+    assert not b.blockchain.resolve()
+    assert len(b.blockchain.chain) == 4
+
+
+def test_reorganize_refuses_forks_below_base_height():
+    network = SimulatedNetwork(seed=1, auto_resolve=False, prune_depth=2)
+    network.add_node('a')
+    network.add_node('b')
+    for _ in range(5):
+        network.mine('a')
+    for _ in range(6):
+        network.mine('b')
+    # La rama de 'b' se separa en el génesis, por debajo de los bloques podados de 'a'
+    assert network.nodes['a'].blockchain.reorganize(network.nodes['b'].blockchain.chain) is None
@@ -0,0 +1,96 @@
+import requests
+
+import node
+from blockchain import Blockchain
+from simulator import SimulatedNetwork
+from utility.response_cache import ResponseCache
+
+
+def test_hit_and_miss():
+    cache = ResponseCache()
+    assert cache.get('/chain', 1) is None
+    cache.put('/chain', 1, b'[]', 200, [])
+    assert cache.get('/chain', 1) == (b'[]', 200, [])
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_new_version_invalidates_entries():
+    cache = ResponseCache()
+    cache.get('/chain', 1)
+    cache.put('/chain', 1, b'[]', 200, [])
+    assert cache.get('/chain', 2) is None
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['invalidations'] == 1
+    # Una respuesta calculada con una versión ya superada no se guarda
+    cache.put('/chain', 1, b'[]', 200, [])
+    assert cache.get('/chain', 2) is None
+
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.get('a', 1)
+    cache.put('a', 1, b'a', 200, [])
+    cache.put('b', 1, b'b', 200, [])
+    cache.get('a', 1)
+    cache.put('c', 1, b'c', 200, [])
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_by_size():
+    cache = ResponseCache(max_bytes=10)
+    cache.get('a', 1)
+    cache.put('a', 1, b'123456', 200, [])
+    cache.put('b', 1, b'123456', 200, [])
+    assert cache.get('a', 1) is None
+    # Una respuesta mayor que la caché entera no se guarda
+    cache.put('c', 1, b'x' * 11, 200, [])
+    assert cache.get('c', 1) is None
+
+
+class OfflineTransport:
+    """Transporte con un reloj manual en el que ningún nodo homólogo responde."""
+
+    def __init__(self):
+        self.clock = 1000.0
+
+    def now(self):
+        return self.clock
+
+    def get(self, node, path, timeout=None):
+        raise requests.exceptions.ConnectionError(node)
+
+    def post(self, node, path, payload, timeout=None):
+        raise requests.exceptions.ConnectionError(node)
+
+
+def test_nodes_endpoint_follows_the_clock(monkeypatch):
+    transport = OfflineTransport()
+    blockchain = Blockchain(None, 'nodes', transport)
+    blockchain.add_peer_node('localhost:5001')
+    monkeypatch.setattr(node, 'blockchain', blockchain)
+    monkeypatch.setattr(node, 'response_cache', ResponseCache())
+    client = node.app.test_client()
+    blockchain.resolve()
+    assert client.get('/nodes').get_json()['peers'][0]['backing_off']
+    # Pasa la espera sin que cambie la versión del estado
+    transport.clock += 60
+    assert not client.get('/nodes').get_json()['peers'][0]['backing_off']
+    blockchain.close()
+
+
+def test_peer_contact_keeps_cached_responses():
+    network = SimulatedNetwork(seed=1, auto_resolve=False)
+    network.add_node('a')
+    network.add_node('b')
+    network.connect('a', 'b')
+    network.mine('a')
+    network.run_until(network.clock + 5)
+    b = network.nodes['b'].blockchain
+    version = b.state_version
+    # Consultar la cadena de un homólogo que no es más larga no cambia nada en el nodo
+    assert not b.resolve()
+    assert b.state_version == version
+    network.close()
@@ -0,0 +1,71 @@
+import pytest
+
+from blockchain import Blockchain
+from utility.seen_cache import SeenCache
+from wallet import Wallet
+
+
+def test_add_reports_new_ids():
+    seen = SeenCache(10)
+    assert seen.add('a')
+    assert not seen.add('a')
+    assert 'a' in seen
+
+
+def test_oldest_ids_are_forgotten():
+    seen = SeenCache(2)
+    seen.add('a')
+    seen.add('b')
+    # Volver a ver 'a' lo convierte en el más reciente
+    seen.add('a')
+    seen.add('c')
+    assert 'a' in seen and 'c' in seen
+    assert 'b' not in seen
+    assert len(seen) == 2
+
+
+@pytest.fixture
+def funded():
+    wallet = Wallet(1, 'ed25519')
+    wallet.create_keys()
+    recipient = Wallet(2, 'ed25519')
+    recipient.create_keys()
+
+    def make(propagation):
+        blockchain = Blockchain(wallet.public_key, propagation, propagation=propagation)
+        blockchain.mine_block()
+        return blockchain
+
+    return wallet, recipient, make
+
+
+def _pay(blockchain, wallet, recipient, amount, is_receiving=False):
+    signature = wallet.sign_transaction(wallet.public_key, recipient.public_key, amount)
+    return blockchain.add_transaction(recipient.public_key, wallet.public_key, signature, amount,
+                                      is_receiving=is_receiving, scheme='ed25519')
+
+
+def test_identical_payment_is_accepted_again_in_direct_mode(funded):
+    wallet, recipient, make = funded
+    blockchain = make('direct')
+    assert _pay(blockchain, wallet, recipient, 1.0)
+    assert _pay(blockchain, wallet, recipient, 1.0)
+    assert _pay(blockchain, wallet, recipient, 1.0, is_receiving=True)
+    assert len(blockchain.get_open_transactions()) == 3
+    blockchain.mine_block()
+    assert _pay(blockchain, wallet, recipient, 1.0)
+    assert len(blockchain.get_open_transactions()) == 1
+    blockchain.close()
+
+
+def test_gossip_relay_duplicate_is_dropped(funded):
+    wallet, recipient, make = funded
+    blockchain = make('gossip')
+    assert _pay(blockchain, wallet, recipient, 1.0, is_receiving=True)
+    # El mismo mensaje que llega por otro camino se da por procesado sin añadirlo otra vez
+    assert _pay(blockchain, wallet, recipient, 1.0, is_receiving=True)
+    assert len(blockchain.get_open_transactions()) == 1
+    # Un pago repetido por el propio usuario no es un reenvío: se acepta
+    assert _pay(blockchain, wallet, recipient, 1.0)
+    assert len(blockchain.get_open_transactions()) == 2
+    blockchain.close()
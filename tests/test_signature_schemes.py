@@ -0,0 +1,60 @@
+import pytest
+
+from transaction import Transaction
+from utility.signature_schemes import SCHEMES, get_scheme
+from wallet import Wallet
+
+
+@pytest.fixture(params=sorted(SCHEMES))
+def wallet(request):
+    wallet = Wallet(1, request.param)
+    wallet.create_keys()
+    return wallet
+
+
+def _transaction(wallet, amount=1.0, recipient='bob'):
+    signature = wallet.sign_transaction(wallet.public_key, recipient, amount)
+    return Transaction(wallet.public_key, recipient, signature, amount, wallet.scheme)
+
+
+def test_sign_and_verify(wallet):
+    assert Wallet.verify_transaction(_transaction(wallet))
+
+
+def test_tampered_transaction_is_invalid(wallet):
+    tx = _transaction(wallet)
+    tx.amount = 2.0
+    assert not Wallet.verify_transaction(tx)
+
+
+def test_malformed_signature_is_invalid(wallet):
+    tx = _transaction(wallet)
+    tx.signature = 'zz'
+    assert not Wallet.verify_transaction(tx)
+
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError):
+        get_scheme('dsa')
+    assert not Wallet.verify_transaction(Transaction('a', 'b', 'c', 1.0, 'dsa'))
+
+
+def test_verify_transactions_keeps_order():
+    wallets = []
+    for node_id, scheme in enumerate(sorted(SCHEMES)):
+        wallet = Wallet(node_id, scheme)
+        wallet.create_keys()
+        wallets.append(wallet)
+    transactions = [_transaction(wallet, amount) for wallet in wallets for amount in (1.0, 2.0)]
+    transactions[1].recipient = 'mallory'
+    expected = [True] * len(transactions)
+    expected[1] = False
+    assert Wallet.verify_transactions(transactions) == expected
+
+
+def test_keys_round_trip(wallet):
+    assert wallet.save_keys()
+    loaded = Wallet(1, wallet.scheme)
+    assert loaded.load_keys()
+    assert loaded.public_key == wallet.public_key
+    assert Wallet.verify_transaction(_transaction(loaded))
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+import requests
+
+from simulator import SimulatedNetwork, LinkProfile, build_topology, simulate
+
+
+def test_topologies():
+    addresses = ['n{}'.format(i) for i in range(6)]
+    assert len(build_topology('mesh', addresses)) == 15
+    assert len(build_topology('ring', addresses)) == 6
+    star = build_topology('star', addresses)
+    assert len(star) == 5 and all('n0' in link for link in star)
+    links = build_topology('random', addresses, degree=3, rng=random.Random(1))
+    connected = {address for link in links for address in link}
+    assert connected == set(addresses)
+
+
+def test_messages_arrive_after_link_latency():
+    network = SimulatedNetwork(seed=1, default_link=LinkProfile(latency=0.5, jitter=0),
+                               auto_resolve=False)
+    network.add_node('a')
+    b = network.add_node('b').blockchain
+    network.connect('a', 'b')
+    network.mine('a')
+    network.run_until(0.4)
+    assert len(b.chain) == 1
+    network.run_until(1.0)
+    assert len(b.chain) == 2
+    network.close()
+
+
+def test_offline_node_is_unreachable():
+    network = SimulatedNetwork(seed=1)
+    network.add_node('a')
+    network.add_node('b')
+    network.set_online('b', False)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        network.request('a', 'b', 'chain')
+    network.close()
+
+
+def test_simulation_converges():
+    metrics = simulate(nodes=4, duration=60.0, seed=3, tx_rate=1.0, block_interval=10.0)
+    assert metrics['nodes'] == 4
+    assert metrics['blocks_mined'] > 0
+    assert metrics['convergence_time'] is not None
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+import blockchain as blockchain_module
+from blockchain import Blockchain
+from simulator import SimulatedNetwork, SimulatedTransport
+from utility.snapshot import build_snapshot, verify_snapshot
+
+
+@pytest.fixture
+def network(monkeypatch):
+    """Red simulada con un nodo 'a' que ha minado 12 bloques (instantánea en la altura 10)."""
+    monkeypatch.setattr(blockchain_module, 'SNAPSHOT_INTERVAL', 5)
+    network = SimulatedNetwork(seed=1, auto_resolve=False)
+    network.add_node('a')
+    for _ in range(12):
+        network.mine('a')
+    network.add_node('b')
+    network.connect('a', 'b')
+    return network
+
+
+def test_commitment_detects_corruption():
+    snapshot = build_snapshot(10, 'hash', {'alice': 5.0})
+    assert verify_snapshot(snapshot)
+    snapshot['balances']['alice'] = 50.0
+    assert not verify_snapshot(snapshot)
+    assert not verify_snapshot({'height': 10})
+
+
+def test_bootstrap_from_snapshot(network):
+    a = network.nodes['a'].blockchain
+    b = network.nodes['b'].blockchain
+    assert b.bootstrap_from_snapshot('a', background=False) == 10
+    assert b.get_base_height() == 10
+    assert b.history_verified is True
+    assert b.chain[-1].index == a.chain[-1].index
+    key = network.nodes['a'].wallet.public_key
+    assert b.get_balance(key) == a.get_balance(key)
+    # La cadena sigue creciendo sobre la instantánea
+    network.mine('b')
+    assert b.chain[-1].index == 13
+
+
+def test_forged_snapshot_is_discarded(network):
+    a = network.nodes['a'].blockchain
+    b = network.nodes['b'].blockchain
+    key = network.nodes['a'].wallet.public_key
+    genuine = a.get_snapshot()
+    balances = dict(genuine['balances'], forger=1000.0)
+    # El compromiso se recalcula: la instantánea falsa pasa la comprobación inicial
+    forged = build_snapshot(genuine['height'], genuine['block_hash'], balances)
+    a.get_snapshot = lambda: forged
+    assert b.bootstrap_from_snapshot('a', background=False) == 10
+    assert b.history_verified is False
+    # Se descarta la instantánea y se vuelve a sincronizar la cadena completa
+    assert b.get_base_height() == 0
+    assert b.chain[0].index == 0
+    assert b.chain[-1].index == a.chain[-1].index
+    assert b.get_balance('forger') == 0
+    assert b.get_balance(key) == a.get_balance(key)
+
+
+def test_history_verification_is_retried(network, monkeypatch):
+    monkeypatch.setattr(blockchain_module, 'HISTORY_RETRY_INTERVAL', 0.01)
+    b = network.nodes['b'].blockchain
+    verify_history = b.verify_history
+    attempts = []
+    done = threading.Event()
+
+    def unreachable_then_verify(node):
+        attempts.append(node)
+        if len(attempts) < 3:
+            return None
+        result = verify_history(node)
+        done.set()
+        return result
+
+    b.verify_history = unreachable_then_verify
+    assert b.bootstrap_from_snapshot('a') == 10
+    assert done.wait(5)
+    assert len(attempts) == 3
+    assert b.history_verified is True
+
+
+def _reopen(network, address):
+    """Vuelve a crear la blockchain de un nodo a partir de sus archivos (como tras reiniciarlo)."""
+    node = network.nodes[address]
+    node.blockchain.close()
+    node.blockchain = Blockchain(node.wallet.public_key, address,
+                                 SimulatedTransport(network, address), address=address)
+    return node.blockchain
+
+
+def test_nodes_synced_from_genesis_are_verified(network):
+    assert network.nodes['a'].blockchain.history_verified is True
+    assert _reopen(network, 'a').history_verified is True
+
+
+def test_verification_result_survives_restart(network):
+    b = network.nodes['b'].blockchain
+    assert b.bootstrap_from_snapshot('a', background=False) == 10
+    b = _reopen(network, 'b')
+    assert b.get_base_height() == 10
+    assert b.history_verified is True
+
+
+def test_pending_verification_resumes_after_restart(network):
+    b = network.nodes['b'].blockchain
+    b.verify_history = lambda node: None
+    assert b.bootstrap_from_snapshot('a', background=False) == 10
+    assert b.history_verified is None
+    b = _reopen(network, 'b')
+    for _ in range(500):
+        if b.history_verified is not None:
+            break
+        time.sleep(0.01)
+    assert b.history_verified is True
+    assert _reopen(network, 'b').history_verified is True
@@ -1,5 +1,6 @@
 from collections import OrderedDict
 from utility.printable import Printable
+from utility.signature_schemes import DEFAULT_SCHEME
 
 
 class Transaction(Printable):
@@ -10,14 +11,26 @@ class Transaction(Printable):
         :recipient: El receptor de las monedas.
         :signature: La firma de la transacción.
         :amount: La cantidad de monedas enviadas.
+        :scheme: El esquema de la firma ('rsa' o 'ed25519').
     """
 
-    def __init__(self, sender, recipient, signature, amount):
+    def __init__(self, sender, recipient, signature, amount, scheme=DEFAULT_SCHEME):
         self.sender = sender
         self.recipient = recipient
         self.amount = amount
         self.signature = signature
+        self.scheme = scheme
+
+    @staticmethod
+    def from_dict(tx):
+        """Crea una transacción a partir de un diccionario (sin esquema, se supone RSA)."""
+        return Transaction(tx['sender'], tx['recipient'], tx['signature'], tx['amount'],
+                           tx.get('scheme', DEFAULT_SCHEME))
 
     def to_ordered_dict(self):
         """Convierte esta operación en un OrderedDict para poder calcular el hash."""
-        return OrderedDict([('sender', self.sender), ('recipient', self.recipient), ('amount', self.amount)])
+        ordered = OrderedDict([('sender', self.sender), ('recipient', self.recipient), ('amount', self.amount)])
+        # El esquema por defecto no se incluye para que no cambien los hashes de los bloques existentes
+        if self.scheme != DEFAULT_SCHEME:
+            ordered['scheme'] = self.scheme
+        return ordered
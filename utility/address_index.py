@@ -0,0 +1,118 @@
+"""Proporciona un índice de las transacciones de la cadena por dirección."""
+
+from bisect import bisect_left, bisect_right
+
+
+class AddressIndex:
+    """
+    Índice secundario que relaciona cada dirección (clave pública) con las posiciones
+    (índice del bloque, posición de la transacción) de las transacciones en las que participa
+    como remitente o destinatario.
+
+    Se registra como observador de la blockchain, por lo que se actualiza de forma incremental
+    al añadir bloques y al deshacerlos durante una reorganización. Las entradas de cada dirección
+    se guardan en orden de altura, de modo que una página se obtiene con una búsqueda binaria.
+
+    Las marcas de tiempo de los bloques pueden retroceder (sólo deben superar la mediana de las
+    anteriores), así que los filtros since/until acotan primero un rango de alturas y después
+    se comprueba la marca de tiempo de cada entrada.
+    """
+
+    def __init__(self):
+        self.__entries = {}
+        # Altura y marca de tiempo de cada bloque indexado (en orden)
+        self.__heights = []
+        self.__timestamps = []
+        # Máxima marca de tiempo hasta cada bloque (no decrece, admite búsqueda binaria)
+        self.__max_timestamps = []
+
+    def block_applied(self, block):
+        for position, tx in enumerate(block.transactions):
+            for address in set((tx.sender, tx.recipient)):
+                self.__entries.setdefault(address, []).append(
+                    (block.index, position))
+        self.__heights.append(block.index)
+        self.__timestamps.append(block.timestamp)
+        self.__max_timestamps.append(max(block.timestamp, self.__max_timestamps[-1])
+                                     if self.__max_timestamps else block.timestamp)
+
+    def block_undone(self, block):
+        for tx in reversed(block.transactions):
+            for address in set((tx.sender, tx.recipient)):
+                entries = self.__entries[address]
+                entries.pop()
+                if not entries:
+                    del self.__entries[address]
+        self.__heights.pop()
+        self.__timestamps.pop()
+        self.__max_timestamps.pop()
+
+    def prune(self, height):
+        """
+        Olvida las entradas de los bloques hasta la altura dada (incluida), cuyos cuerpos se
+        han podado.
+
+        Argumentos:
+            :height: La altura del último bloque podado.
+        """
+        for address in list(self.__entries):
+            entries = self.__entries[address]
+            cut = bisect_right(entries, (height, float('inf')))
+            if cut == len(entries):
+                del self.__entries[address]
+            elif cut:
+                del entries[:cut]
+
+    def count(self, address):
+        """Devuelve el número de transacciones indexadas de una dirección."""
+        return len(self.__entries.get(address, []))
+
+    def __height_range(self, from_height, to_height, since):
+        """Convierte los filtros de altura y de tiempo en un rango de alturas [low, high]."""
+        low = from_height if from_height is not None else 0
+        high = to_height if to_height is not None else float('inf')
+        # Todos los bloques anteriores al primero cuya máxima acumulada alcanza since son más
+        # antiguos; until no acota las alturas porque un bloque posterior puede ser anterior
+        if since is not None:
+            position = bisect_left(self.__max_timestamps, since)
+            low = max(low, self.__heights[position]
+                      if position < len(self.__heights) else float('inf'))
+        return low, high
+
+    def __timestamp(self, height):
+        """Devuelve la marca de tiempo del bloque indexado con la altura dada."""
+        return self.__timestamps[height - self.__heights[0]]
+
+    def lookup(self, address, page=1, page_size=20, from_height=None, to_height=None,
+               since=None, until=None):
+        """
+        Devuelve una página de las posiciones (índice del bloque, posición de la transacción)
+        de las transacciones de una dirección, de la más reciente a la más antigua, junto con
+        el número total de transacciones que cumplen los filtros.
+
+        Argumentos:
+            :address: La dirección.
+            :page: El número de página (empezando en 1).
+            :page_size: El número de transacciones por página.
+            :from_height: Altura mínima del bloque (incluida).
+            :to_height: Altura máxima del bloque (incluida).
+            :since: Marca de tiempo mínima del bloque (incluida).
+            :until: Marca de tiempo máxima del bloque (incluida).
+        """
+        entries = self.__entries.get(address, [])
+        low, high = self.__height_range(from_height, to_height, since)
+        if low > high:
+            return [], 0
+        start = bisect_left(entries, (low, -1))
+        end = bisect_right(entries, (high, float('inf')))
+        if since is not None or until is not None:
+            entries = [entry for entry in entries[start:end]
+                       if (since is None or self.__timestamp(entry[0]) >= since) and
+                       (until is None or self.__timestamp(entry[0]) <= until)]
+            start, end = 0, len(entries)
+        total = max(0, end - start)
+        page_end = end - (page - 1) * page_size
+        page_start = max(start, page_end - page_size)
+        if page_end <= start:
+            return [], total
+        return entries[page_start:page_end][::-1], total
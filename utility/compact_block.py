@@ -0,0 +1,50 @@
+"""
+Proporciona la representación compacta de los bloques que se difunden por la red.
+
+Un bloque compacto contiene la cabecera del bloque, los identificadores cortos de sus
+transacciones y la transacción de recompensa completa (que nunca está en las transacciones
+abiertas de los demás nodos). El receptor reconstruye el bloque con sus propias
+transacciones abiertas y sólo pide al emisor las que le faltan.
+"""
+
+import json
+
+from utility.hash_util import hash_string_256, hash_transaction
+
+# Número de caracteres hexadecimales del hash de la transacción que forman su identificador corto
+SHORT_ID_LENGTH = 16
+
+
+def short_id(transaction):
+    """
+    Devuelve el identificador corto de una transacción.
+
+    Argumentos:
+        :transaction: La transacción.
+    """
+    return hash_transaction(transaction)[:SHORT_ID_LENGTH]
+
+
+def compact_block(block):
+    """
+    Convierte un bloque en su representación compacta (un diccionario).
+
+    Argumentos:
+        :block: El bloque que debe convertirse.
+    """
+    compact = {key: value for key, value in block.__dict__.items()
+               if key != 'transactions'}
+    compact['short_ids'] = [short_id(tx) for tx in block.transactions[:-1]]
+    compact['reward'] = (block.transactions[-1].__dict__.copy()
+                         if block.transactions else None)
+    return compact
+
+
+def compact_block_id(compact):
+    """
+    Devuelve el identificador de un bloque compacto (se usa para descartar duplicados).
+
+    Argumentos:
+        :compact: El bloque compacto.
+    """
+    return hash_string_256(json.dumps(compact, sort_keys=True).encode())
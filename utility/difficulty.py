@@ -0,0 +1,151 @@
+"""
+Proporciona el ajuste de la dificultad de la prueba de trabajo.
+
+La dificultad de un bloque es el número medio de intentos necesarios para encontrar su
+prueba: un hash es válido si, leído como número, es menor que 2^256 / dificultad. La
+dificultad inicial (256) equivale a la regla original de dos ceros hexadecimales a la
+izquierda. Cada cierto número de bloques se recalcula a partir de las marcas de tiempo para
+mantener el intervalo objetivo entre bloques.
+
+Los bloques creados antes de que la dificultad se guardara en la cabecera no la tienen
+(difficulty None). Se aceptan sólo al principio de la cadena, con la dificultad inicial y sin
+comprobar sus marcas de tiempo (todas valían lo mismo), y no cuentan para el ajuste.
+"""
+
+# Dificultad del bloque inicial (equivale a exigir dos ceros hexadecimales a la izquierda)
+INITIAL_DIFFICULTY = 256
+# Dificultad mínima (cualquier hash es válido)
+MIN_DIFFICULTY = 1
+# Cada cuántos bloques se recalcula la dificultad
+RETARGET_INTERVAL = 10
+# Intervalo objetivo entre bloques en segundos
+TARGET_BLOCK_TIME = 10.0
+# Factor máximo de cambio de la dificultad en cada ajuste (en ambos sentidos)
+MAX_ADJUSTMENT = 4
+# Número de bloques anteriores cuya mediana de marcas de tiempo debe superar un bloque nuevo
+MEDIAN_TIME_SPAN = 11
+# Segundos máximos que la marca de tiempo de un bloque recibido puede adelantarse al reloj local
+MAX_FUTURE_BLOCK_TIME = 2 * 60 * 60
+
+
+def block_difficulty(block):
+    """Devuelve la dificultad de un bloque (la inicial si es anterior a guardarla)."""
+    return block.difficulty if block.difficulty is not None else INITIAL_DIFFICULTY
+
+
+def chain_work(chain, after=None):
+    """
+    Devuelve el trabajo acumulado de una cadena: la suma de las dificultades de sus bloques
+    (el número medio de intentos que ha costado minarlos). Es lo que decide entre dos cadenas
+    en competencia, porque con la dificultad ajustable la más larga no es la más costosa.
+
+    Argumentos:
+        :chain: La lista de bloques.
+        :after: Si se indica, sólo cuentan los bloques con un índice mayor (p. ej. el de la
+                bifurcación, para comparar cadenas que empiezan en alturas distintas).
+    """
+    return sum(block_difficulty(block) for block in chain
+               if after is None or block.index > after)
+
+
+class DifficultyPolicy:
+    """
+    Regla de ajuste de la dificultad: la compartida por todos los nodos de la red.
+
+    Atributos:
+        :target_block_time: El intervalo objetivo entre bloques en segundos.
+        :retarget_interval: Cada cuántos bloques se recalcula la dificultad.
+        :legacy_height: Altura máxima de los bloques sin dificultad (None si no hay límite).
+    """
+
+    def __init__(self, target_block_time=TARGET_BLOCK_TIME, retarget_interval=RETARGET_INTERVAL,
+                 legacy_height=None):
+        self.target_block_time = target_block_time
+        self.retarget_interval = retarget_interval
+        self.legacy_height = legacy_height
+
+    def valid_legacy_block(self, chain, position):
+        """
+        Comprueba que un bloque sin dificultad puede aceptarse: sólo a continuación del
+        bloque inicial o de otro bloque sin dificultad, y no por encima de legacy_height.
+
+        Argumentos:
+            :chain: La lista de bloques.
+            :position: La posición del bloque en la lista.
+        """
+        previous = chain[position - 1]
+        if self.legacy_height is not None and chain[position].index > self.legacy_height:
+            return False
+        return previous.index == 0 or previous.difficulty is None
+
+    def next_difficulty(self, chain, position=None):
+        """
+        Devuelve la dificultad que debe tener el bloque de una posición de la cadena (por
+        defecto, el siguiente bloque que se añada) o None si la cadena no contiene los bloques
+        necesarios para calcularla.
+
+        En los bloques múltiplos de retarget_interval, la dificultad del bloque anterior se
+        multiplica por el cociente entre el tiempo objetivo y el tiempo real de los últimos
+        bloques (sin contar el bloque inicial, cuya marca de tiempo es fija), limitado a
+        MAX_ADJUSTMENT. En el resto, y si los últimos bloques no tienen dificultad, se mantiene
+        la del bloque anterior.
+
+        Argumentos:
+            :chain: La lista de bloques (puede empezar en cualquier altura).
+            :position: La posición del bloque en la lista.
+        """
+        if position is None:
+            position = len(chain)
+        previous = chain[position - 1]
+        difficulty = block_difficulty(previous)
+        index = previous.index + 1
+        if index % self.retarget_interval != 0:
+            return difficulty
+        first_index = max(index - self.retarget_interval, 1)
+        if first_index < chain[0].index:
+            return None
+        gaps = previous.index - first_index
+        if gaps <= 0:
+            return difficulty
+        first = chain[position - 1 - gaps]
+        # Las marcas de tiempo de los bloques sin dificultad no sirven para el ajuste
+        if first.difficulty is None:
+            return difficulty
+        actual = previous.timestamp - first.timestamp
+        expected = gaps * self.target_block_time
+        if actual <= 0:
+            factor = MAX_ADJUSTMENT
+        else:
+            factor = min(max(expected / actual, 1.0 / MAX_ADJUSTMENT), MAX_ADJUSTMENT)
+        return max(MIN_DIFFICULTY, int(round(difficulty * factor)))
+
+    @staticmethod
+    def min_timestamp(chain, position=None):
+        """
+        Devuelve la marca de tiempo mínima de un bloque: la mediana de las de los
+        MEDIAN_TIME_SPAN bloques anteriores (así no se puede retrasar el reloj de la cadena
+        para rebajar la dificultad).
+
+        Argumentos:
+            :chain: La lista de bloques.
+            :position: La posición del bloque en la lista (por defecto, el siguiente bloque).
+        """
+        if position is None:
+            position = len(chain)
+        previous = sorted(block.timestamp for block in
+                          chain[max(0, position - MEDIAN_TIME_SPAN):position])
+        return previous[len(previous) // 2]
+
+    @classmethod
+    def valid_timestamp(cls, chain, position=None, timestamp=None):
+        """
+        Comprueba que la marca de tiempo de un bloque no es anterior a la mínima.
+
+        Argumentos:
+            :chain: La lista de bloques.
+            :position: La posición del bloque en la lista (por defecto, el siguiente bloque).
+            :timestamp: La marca de tiempo que se comprueba (por defecto, la del bloque).
+        """
+        if timestamp is None:
+            timestamp = chain[position].timestamp
+        return timestamp >= cls.min_timestamp(chain, position)
@@ -0,0 +1,246 @@
+"""
+Proporciona el flujo de eventos (server-sent events) con el que la interfaz web recibe los
+cambios del nodo sin consultar periódicamente los endpoints de lectura.
+
+Todas las conexiones se atienden en un único hilo con un bucle de asyncio, de modo que el
+número de suscriptores no multiplica los hilos del servidor. La blockchain publica los eventos
+desde cualquier hilo a través de un observador (ChainEvents).
+"""
+
+import asyncio
+from collections import deque
+import json
+import threading
+
+from utility.hash_util import hash_block, hash_transaction
+
+# Número de eventos recientes que se guardan para los clientes que se reconectan
+HISTORY_SIZE = 512
+# Número máximo de eventos pendientes de enviar a un cliente antes de desconectarlo
+SUBSCRIBER_QUEUE_SIZE = 256
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+KEEPALIVE_INTERVAL = 15
+# Milisegundos que espera el navegador antes de reconectarse
+RETRY_MILLISECONDS = 3000
+
+RESPONSE_HEADERS = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Access-Control-Allow-Origin: *\r\n'
+    b'\r\n'
+)
+NOT_FOUND = (
+    b'HTTP/1.1 404 Not Found\r\n'
+    b'Content-Length: 0\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+)
+
+
+class EventHub:
+    """
+    Servidor de server-sent events en la ruta /events.
+
+    Cada evento publicado recibe un identificador creciente y se guarda en un historial acotado:
+    un cliente que se reconecta con la cabecera Last-Event-ID recibe los eventos que se perdió.
+    Si esos eventos ya no están en el historial, recibe un evento 'reset' para que vuelva a
+    cargar el estado completo. Los clientes que no consumen sus eventos a tiempo se desconectan
+    en lugar de acumular memoria sin límite.
+    """
+
+    def __init__(self, host='0.0.0.0', port=6001):
+        self.host = host
+        self.port = port
+        self.published = 0
+        self.dropped = 0
+        self.__subscribers = set()
+        self.__history = deque(maxlen=HISTORY_SIZE)
+        self.__next_id = 1
+        self.__lock = threading.Lock()
+        self.__loop = None
+        self.__ready = threading.Event()
+
+    def start(self):
+        """Arranca el servidor en un hilo en segundo plano y espera a que acepte conexiones."""
+        threading.Thread(target=self.__run, daemon=True).start()
+        self.__ready.wait()
+
+    def __run(self):
+        self.__loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_until_complete(
+            asyncio.start_server(self.__handle, self.host, self.port))
+        self.__ready.set()
+        self.__loop.run_forever()
+
+    def publish(self, event, data):
+        """
+        Publica un evento para todos los suscriptores (se puede llamar desde cualquier hilo).
+
+        Argumentos:
+            :event: El nombre del evento.
+            :data: Los datos del evento (se envían como JSON).
+        """
+        with self.__lock:
+            event_id = self.__next_id
+            self.__next_id += 1
+            message = 'id: {}\nevent: {}\ndata: {}\n\n'.format(
+                event_id, event, json.dumps(data)).encode()
+            self.__history.append((event_id, message))
+            self.published += 1
+            # Se encola dentro del cerrojo para que el bucle reciba los eventos en orden
+            if self.__loop is not None:
+                self.__loop.call_soon_threadsafe(
+                    self.__broadcast, event_id, message)
+
+    def __broadcast(self, event_id, message):
+        for queue in list(self.__subscribers):
+            try:
+                queue.put_nowait((event_id, message))
+            except asyncio.QueueFull:
+                # Cliente demasiado lento: se desconecta y recupera lo perdido al reconectarse
+                self.__subscribers.discard(queue)
+                self.dropped += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def __missed_events(self, last_event_id):
+        """
+        Devuelve los eventos posteriores al último recibido por el cliente o None si alguno
+        ya no está en el historial.
+        """
+        with self.__lock:
+            history = list(self.__history)
+            next_id = self.__next_id
+        if last_event_id is None:
+            return []
+        # Un identificador desconocido indica que el nodo se ha reiniciado
+        if last_event_id >= next_id:
+            return None
+        missed = [entry for entry in history if entry[0] > last_event_id]
+        if last_event_id + 1 < next_id and (not missed or missed[0][0] != last_event_id + 1):
+            return None
+        return missed
+
+    async def __handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET' or parts[1].split('?')[0] != '/events':
+                writer.write(NOT_FOUND)
+                await writer.drain()
+                return
+            try:
+                last_event_id = int(headers['last-event-id'])
+            except (KeyError, ValueError):
+                last_event_id = None
+            await self.__stream(writer, last_event_id)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def __stream(self, writer, last_event_id):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.__subscribers.add(queue)
+        try:
+            writer.write(RESPONSE_HEADERS)
+            writer.write('retry: {}\n\n'.format(RETRY_MILLISECONDS).encode())
+            sent = last_event_id or 0
+            missed = self.__missed_events(last_event_id)
+            if missed is None:
+                writer.write(b'event: reset\ndata: {}\n\n')
+                missed, sent = [], 0
+            for event_id, message in missed:
+                writer.write(message)
+                sent = event_id
+            await writer.drain()
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    writer.write(b': keepalive\n\n')
+                    await writer.drain()
+                    continue
+                if item is None:
+                    break
+                event_id, message = item
+                # Un evento puede llegar tanto por el historial como por la cola
+                if event_id <= sent:
+                    continue
+                writer.write(message)
+                sent = event_id
+                await writer.drain()
+        finally:
+            self.__subscribers.discard(queue)
+
+    def stats(self):
+        """Devuelve el número de suscriptores conectados y de eventos publicados y descartados."""
+        return {
+            'subscribers': len(self.__subscribers),
+            'published': self.published,
+            'dropped_subscribers': self.dropped,
+            'port': self.port
+        }
+
+
+class ChainEvents:
+    """
+    Observador de la blockchain que traduce sus avisos en eventos del flujo: cabeceras de los
+    bloques nuevos, bloques deshechos y reorganizaciones, altas y bajas de transacciones
+    abiertas y cambios en los nodos homólogos.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    @staticmethod
+    def __header(block):
+        return {
+            'index': block.index,
+            'previous_hash': block.previous_hash,
+            'timestamp': block.timestamp,
+            'proof': block.proof,
+            'difficulty': block.difficulty,
+            'hash': hash_block(block),
+            'transactions': len(block.transactions)
+        }
+
+    @staticmethod
+    def __transaction(transaction):
+        data = transaction.__dict__.copy()
+        data['id'] = hash_transaction(transaction)
+        return data
+
+    def block_applied(self, block):
+        self.hub.publish('block', self.__header(block))
+
+    def block_undone(self, block):
+        self.hub.publish('block_undone', {'index': block.index, 'hash': hash_block(block)})
+
+    def chain_reorganized(self, fork, undone, applied):
+        self.hub.publish('reorg', {
+            'fork': fork,
+            'undone': [block.index for block in undone],
+            'applied': [block.index for block in applied]
+        })
+
+    def transaction_added(self, transaction):
+        self.hub.publish('transaction_added', self.__transaction(transaction))
+
+    def transactions_removed(self, transactions):
+        self.hub.publish('transactions_removed', {
+            'transactions': [self.__transaction(tx) for tx in transactions]})
+
+    def peers_changed(self, peers):
+        self.hub.publish('peers', {'peers': peers})
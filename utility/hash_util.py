@@ -1,6 +1,8 @@
 import hashlib as hl
 import json
 
+from utility.difficulty import INITIAL_DIFFICULTY
+
 
 def hash_string_256(string):
     """
@@ -19,8 +21,27 @@ def hash_block(block):
     Argumentos:
         :block: El bloque al que debe aplicarse el hash.
     """
+    # Las cabeceras de bloques podados guardan el hash del bloque completo
+    if getattr(block, 'pruned', False):
+        return block.block_hash
     hashable_block = block.__dict__.copy()
+    # La dificultad inicial (o la ausencia de dificultad) no se incluye para que no cambien
+    # los hashes de los bloques creados antes de que la dificultad formara parte de la cabecera
+    if hashable_block.get('difficulty') in (None, INITIAL_DIFFICULTY):
+        del hashable_block['difficulty']
     hashable_block['transactions'] = [
         tx.to_ordered_dict() for tx in hashable_block['transactions']
     ]
     return hash_string_256(json.dumps(hashable_block, sort_keys=True).encode())
+
+
+def hash_transaction(transaction):
+    """
+    Realiza el hash de una transacción (incluida su firma) y devuelve su identificador.
+
+    Argumentos:
+        :transaction: La transacción a la que debe aplicarse el hash.
+    """
+    hashable_tx = transaction.to_ordered_dict()
+    hashable_tx['signature'] = transaction.signature
+    return hash_string_256(json.dumps(hashable_tx, sort_keys=True).encode())
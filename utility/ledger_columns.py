@@ -0,0 +1,184 @@
+"""Proporciona un almacén columnar de las transacciones de la cadena para análisis masivos."""
+
+import numpy as np
+
+# Remitente de las transacciones de recompensa de minado (crean monedas nuevas)
+MINING_SENDER = 'RECOMPENSA_MINADO'
+# Capacidad inicial de las columnas (se duplica cada vez que se llenan)
+INITIAL_CAPACITY = 1024
+
+
+class LedgerColumns:
+    """
+    Almacena las transacciones confirmadas en columnas de NumPy (importe, altura del bloque,
+    remitente y destinatario como identificadores enteros de dirección) para calcular saldos
+    y agregados de toda la cadena en una sola pasada vectorizada.
+
+    Se registra como observador de la blockchain: las columnas crecen al añadir bloques y se
+    recortan al deshacerlos, sin reconstruir nada desde cero.
+    """
+
+    def __init__(self):
+        self.__address_ids = {}
+        self.addresses = []
+        self.__size = 0
+        self.amounts = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        self.heights = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.senders = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self.recipients = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        # Saldos de partida (por identificador) cuando la cadena empieza en una instantánea
+        self.__base_balances = {}
+        self.__intern(MINING_SENDER)
+
+    def __len__(self):
+        return self.__size
+
+    def __intern(self, address):
+        """Devuelve el identificador entero de una dirección (creándolo si no existe)."""
+        address_id = self.__address_ids.get(address)
+        if address_id is None:
+            address_id = len(self.addresses)
+            self.__address_ids[address] = address_id
+            self.addresses.append(address)
+        return address_id
+
+    def __reserve(self, size):
+        capacity = len(self.amounts)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ('amounts', 'heights', 'senders', 'recipients'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.__size] = column[:self.__size]
+            setattr(self, name, grown)
+
+    def set_base_balances(self, balances):
+        """
+        Establece los saldos de partida de cada dirección (los de la instantánea con la que
+        empieza la cadena local).
+
+        Argumentos:
+            :balances: Diccionario con el saldo de cada dirección.
+        """
+        self.__base_balances = {self.__intern(address): amount
+                                for address, amount in balances.items()}
+
+    def block_applied(self, block):
+        count = len(block.transactions)
+        self.__reserve(self.__size + count)
+        end = self.__size + count
+        self.amounts[self.__size:end] = [tx.amount for tx in block.transactions]
+        self.heights[self.__size:end] = block.index
+        self.senders[self.__size:end] = [
+            self.__intern(tx.sender) for tx in block.transactions]
+        self.recipients[self.__size:end] = [
+            self.__intern(tx.recipient) for tx in block.transactions]
+        self.__size = end
+
+    def block_undone(self, block):
+        # Las alturas están ordenadas: las filas del bloque son las últimas
+        self.__size = int(np.searchsorted(
+            self.heights[:self.__size], block.index, side='left'))
+
+    def drop_until(self, height):
+        """
+        Elimina las filas de los bloques hasta la altura dada (incluida). Los saldos de esos
+        bloques deben haberse incorporado antes a los saldos de partida.
+
+        Argumentos:
+            :height: La altura del último bloque que se elimina.
+        """
+        cut = int(np.searchsorted(
+            self.heights[:self.__size], height, side='right'))
+        remaining = self.__size - cut
+        for column in (self.amounts, self.heights, self.senders, self.recipients):
+            column[:remaining] = column[cut:self.__size]
+        self.__size = remaining
+
+    def balances(self, to_height=None):
+        """
+        Devuelve un array con el saldo confirmado de cada identificador de dirección.
+
+        Argumentos:
+            :to_height: Si se indica, sólo se tienen en cuenta los bloques hasta esa altura.
+        """
+        count = len(self.addresses)
+        size = self.__size
+        if to_height is not None:
+            size = int(np.searchsorted(
+                self.heights[:size], to_height, side='right'))
+        received = np.bincount(self.recipients[:size],
+                               weights=self.amounts[:size], minlength=count)
+        sent = np.bincount(self.senders[:size],
+                           weights=self.amounts[:size], minlength=count)
+        # bincount devuelve enteros cuando no hay filas
+        balances = (received - sent).astype(np.float64, copy=False)
+        for address_id, amount in self.__base_balances.items():
+            balances[address_id] += amount
+        return balances
+
+    def balance_map(self, to_height=None):
+        """
+        Devuelve un diccionario con el saldo confirmado de cada dirección.
+
+        Argumentos:
+            :to_height: Si se indica, sólo se tienen en cuenta los bloques hasta esa altura.
+        """
+        balances = self.balances(to_height)
+        return {address: float(balances[address_id])
+                for address_id, address in enumerate(self.addresses)
+                if address != MINING_SENDER}
+
+    def top_holders(self, limit=10):
+        """
+        Devuelve las direcciones con mayor saldo confirmado como una lista de pares
+        (dirección, saldo), de mayor a menor.
+
+        Argumentos:
+            :limit: El número de direcciones que se devuelven.
+        """
+        balances = self.balances()
+        balances[self.__address_ids[MINING_SENDER]] = -np.inf
+        limit = min(limit, len(balances) - 1)
+        if limit <= 0:
+            return []
+        top = np.argpartition(-balances, limit - 1)[:limit]
+        top = top[np.argsort(-balances[top], kind='stable')]
+        return [(self.addresses[address_id], float(balances[address_id]))
+                for address_id in top]
+
+    def flow_totals(self, from_height=None, to_height=None):
+        """
+        Devuelve los flujos de monedas en un rango de alturas (ambas incluidas): monedas
+        creadas por recompensas, monedas transferidas, número de transacciones y volumen
+        transferido en cada bloque del rango.
+
+        Argumentos:
+            :from_height: Altura mínima (por defecto, la primera).
+            :to_height: Altura máxima (por defecto, la última).
+        """
+        size = self.__size
+        heights = self.heights[:size]
+        start = 0 if from_height is None else int(
+            np.searchsorted(heights, from_height, side='left'))
+        end = size if to_height is None else int(
+            np.searchsorted(heights, to_height, side='right'))
+        amounts = self.amounts[start:end]
+        minted = self.senders[start:end] == self.__address_ids[MINING_SENDER]
+        transfers = ~minted
+        block_heights = heights[start:end]
+        low = int(block_heights[0]) if end > start else 0
+        high = int(block_heights[-1]) if end > start else -1
+        per_block = np.bincount(block_heights[transfers] - low,
+                                weights=amounts[transfers], minlength=high - low + 1)
+        return {
+            'from_height': low if end > start else from_height,
+            'to_height': high if end > start else to_height,
+            'minted': float(amounts[minted].sum()),
+            'transferred': float(amounts[transfers].sum()),
+            'transactions': int(transfers.sum()),
+            'transferred_per_block': {low + offset: float(volume)
+                                      for offset, volume in enumerate(per_block)},
+        }
@@ -0,0 +1,181 @@
+"""
+Proporciona el diario (journal) de las transacciones abiertas.
+
+Aceptar una transacción ya no reescribe todo el archivo de estado de la blockchain: la
+transacción se añade al final del diario mempool-<node_id>.journal. Cada vez que se guarda el
+estado completo (por ejemplo, cuando un bloque confirma transacciones) las transacciones
+abiertas quedan en el archivo de estado y el diario se vacía. Al arrancar, las transacciones
+del diario se vuelven a añadir a las abiertas.
+
+Cada entrada lleva la generación del diario (cuántas veces se ha guardado el estado completo),
+que también se guarda en el archivo de estado. Si el nodo cae después de guardar el estado
+pero antes de vaciar el diario, sus entradas son de una generación anterior y se descartan al
+arrancar: no se puede hacer por el hash, porque dos pagos idénticos tienen el mismo.
+"""
+
+import json
+import os
+import threading
+from time import monotonic
+
+# Modos de durabilidad: 'sync' (cada transacción se sincroniza con el disco antes de aceptarse;
+# las escrituras concurrentes comparten un mismo fsync) o 'batch' (se escriben y sincronizan en
+# lotes, como mucho cada fsync_interval segundos o cada batch_size transacciones)
+DURABILITY_MODES = ('sync', 'batch')
+# Segundos máximos que una transacción aceptada puede esperar a llegar al disco (modo 'batch')
+FSYNC_INTERVAL = 0.05
+# Número de transacciones pendientes que fuerzan la escritura del lote (modo 'batch')
+BATCH_SIZE = 128
+
+
+class MempoolJournal:
+    """
+    Diario de solo escritura al final de las transacciones abiertas.
+
+    Atributos:
+        :mode: El modo de durabilidad ('sync' o 'batch').
+        :fsync_interval: Segundos máximos entre sincronizaciones (modo 'batch').
+        :batch_size: Transacciones pendientes que fuerzan una sincronización (modo 'batch').
+        :generation: La generación con la que se marcan las nuevas entradas.
+    """
+
+    def __init__(self, node_id, mode='batch', fsync_interval=FSYNC_INTERVAL,
+                 batch_size=BATCH_SIZE):
+        if mode not in DURABILITY_MODES:
+            raise ValueError('Unknown durability mode: {}'.format(mode))
+        self.path = 'mempool-{}.journal'.format(node_id)
+        self.mode = mode
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.syncs = 0
+        self.generation = 0
+        self.__file = open(self.path, mode='a')
+        # Protege el archivo y el lote pendiente
+        self.__lock = threading.Lock()
+        # Sólo un hilo sincroniza a la vez; los demás esperan y aprovechan su fsync
+        self.__sync_lock = threading.Lock()
+        self.__pending = []
+        self.__oldest_pending = None
+        self.__written = 0
+        self.__synced = 0
+        self.__closed = False
+        self.__wake = threading.Event()
+        # Hilo que escribe los lotes en modo 'batch' (se arranca con la primera transacción)
+        self.__flusher = None
+
+    def append(self, transaction):
+        """
+        Añade una transacción al diario. En modo 'sync' no vuelve hasta que está en el disco.
+
+        Argumentos:
+            :transaction: La transacción aceptada.
+        """
+        with self.__lock:
+            line = json.dumps(dict(transaction.__dict__, generation=self.generation)) + '\n'
+            if self.__closed:
+                # La blockchain ya se ha sustituido por otra (que lee el diario al cargarse)
+                return
+            if self.mode == 'sync':
+                self.__file.write(line)
+                self.__written += 1
+                sequence = self.__written
+            else:
+                if self.__flusher is None:
+                    self.__flusher = threading.Thread(target=self.__flush_periodically,
+                                                      daemon=True)
+                    self.__flusher.start()
+                self.__pending.append(line)
+                if self.__oldest_pending is None:
+                    self.__oldest_pending = monotonic()
+                full = (len(self.__pending) >= self.batch_size or
+                        monotonic() - self.__oldest_pending >= self.fsync_interval)
+        if self.mode == 'sync':
+            self.__sync(sequence)
+        elif full:
+            self.flush()
+
+    def flush(self):
+        """Escribe y sincroniza con el disco las transacciones pendientes."""
+        with self.__lock:
+            if self.__closed:
+                return
+            if self.__pending:
+                self.__file.write(''.join(self.__pending))
+                self.__written += len(self.__pending)
+                self.__pending = []
+                self.__oldest_pending = None
+            sequence = self.__written
+        self.__sync(sequence)
+
+    def __sync(self, sequence):
+        """Sincroniza el diario hasta la entrada indicada (si otro hilo no lo ha hecho ya)."""
+        with self.__sync_lock:
+            if self.__synced >= sequence:
+                return
+            with self.__lock:
+                if self.__closed:
+                    return
+                target = self.__written
+                self.__file.flush()
+                fileno = self.__file.fileno()
+            os.fsync(fileno)
+            self.__synced = target
+            self.syncs += 1
+
+    def __flush_periodically(self):
+        while not self.__closed:
+            self.__wake.wait(self.fsync_interval)
+            if not self.__closed:
+                self.flush()
+
+    def reset(self):
+        """
+        Vacía el diario (compactación) y pasa a la generación siguiente: se llama cuando el
+        estado completo, con las transacciones abiertas, ya se ha guardado en el archivo de la
+        blockchain.
+        """
+        with self.__sync_lock:
+            with self.__lock:
+                if self.__closed:
+                    return
+                self.__pending = []
+                self.__oldest_pending = None
+                self.__file.truncate(0)
+                self.__file.seek(0)
+                self.__synced = self.__written
+                self.generation += 1
+
+    def replay(self):
+        """
+        Devuelve las transacciones (como diccionarios) guardadas en el diario. Una última
+        línea incompleta (escritura interrumpida por una caída) se descarta y se recorta del
+        archivo, para que las siguientes entradas no se añadan pegadas a ella.
+        """
+        self.flush()
+        transactions = []
+        valid_size = 0
+        try:
+            with open(self.path, mode='rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError('Incomplete entry')
+                        transactions.append(json.loads(line))
+                    except ValueError:
+                        break
+                    valid_size += len(line)
+            with self.__lock:
+                if not self.__closed and os.path.getsize(self.path) > valid_size:
+                    self.__file.truncate(valid_size)
+        except IOError:
+            pass
+        return transactions
+
+    def close(self):
+        """Escribe lo pendiente y cierra el diario."""
+        self.flush()
+        with self.__sync_lock:
+            with self.__lock:
+                self.__closed = True
+                self.__file.close()
+        self.__wake.set()
@@ -0,0 +1,139 @@
+"""Proporciona la tabla de nodos homólogos con el seguimiento de su estado."""
+
+from time import time
+
+from utility.printable import Printable
+
+# Espera inicial (en segundos) tras el primer fallo de un nodo homólogo
+BASE_BACKOFF = 1.0
+# Espera máxima entre reintentos a un nodo que sigue fallando
+MAX_BACKOFF = 300.0
+# Un nodo se expulsa tras este número de fallos consecutivos...
+EVICT_AFTER_FAILURES = 8
+# ...siempre que, además, lleve este tiempo (en segundos) sin responder
+EVICT_AFTER_SECONDS = 3600.0
+# Peso de la última medida en la media móvil de la latencia
+LATENCY_SMOOTHING = 0.3
+
+
+class PeerInfo(Printable):
+    """
+    Estado de un nodo homólogo.
+
+    Atributos:
+        :address: La URL (host:puerto) del nodo.
+        :latency: Latencia media (móvil exponencial) de sus respuestas en segundos.
+        :failures: Número de fallos consecutivos.
+        :total_failures: Número total de fallos.
+        :added_at: Momento en el que se añadió el nodo.
+        :last_seen: Momento de la última respuesta correcta.
+        :next_retry: Momento a partir del cual se vuelve a contactar con el nodo.
+    """
+
+    def __init__(self, address, added_at):
+        self.address = address
+        self.latency = None
+        self.failures = 0
+        self.total_failures = 0
+        self.added_at = added_at
+        self.last_seen = None
+        self.next_retry = added_at
+
+
+class PeerTable:
+    """
+    Tabla de nodos homólogos. Registra la latencia, los fallos y la última vez que se vio
+    a cada nodo, aplica una espera exponencial a los nodos que fallan y expulsa a los que
+    no responden durante demasiado tiempo.
+    """
+
+    def __init__(self, clock=time):
+        self.__clock = clock
+        self.__peers = {}
+
+    def __contains__(self, address):
+        return address in self.__peers
+
+    def __len__(self):
+        return len(self.__peers)
+
+    def add(self, address):
+        """Añade un nodo a la tabla (si ya existía, se le da una nueva oportunidad)."""
+        peer = self.__peers.get(address)
+        if peer is None:
+            self.__peers[address] = PeerInfo(address, self.__clock())
+        else:
+            peer.failures = 0
+            peer.next_retry = self.__clock()
+
+    def remove(self, address):
+        """Elimina un nodo de la tabla."""
+        self.__peers.pop(address, None)
+
+    def addresses(self):
+        """Devuelve las direcciones de todos los nodos de la tabla."""
+        return list(self.__peers)
+
+    def ranked(self):
+        """
+        Devuelve las direcciones de los nodos que pueden contactarse ahora (fuera de su
+        espera), los más sanos primero: menos fallos y menor latencia.
+        """
+        now = self.__clock()
+        available = [peer for peer in self.__peers.values()
+                     if peer.next_retry <= now]
+        available.sort(key=lambda peer: (
+            peer.failures, peer.latency if peer.latency is not None else float('inf')))
+        return [peer.address for peer in available]
+
+    def record_success(self, address, latency):
+        """
+        Registra una respuesta correcta de un nodo.
+
+        Argumentos:
+            :address: La dirección del nodo.
+            :latency: El tiempo de respuesta en segundos.
+        """
+        peer = self.__peers.get(address)
+        if peer is None:
+            return
+        if peer.latency is None:
+            peer.latency = latency
+        else:
+            peer.latency = (LATENCY_SMOOTHING * latency +
+                            (1 - LATENCY_SMOOTHING) * peer.latency)
+        peer.failures = 0
+        peer.last_seen = self.__clock()
+        peer.next_retry = peer.last_seen
+
+    def record_failure(self, address):
+        """
+        Registra un fallo de un nodo y calcula su próxima espera. Devuelve True si el
+        nodo ha sido expulsado de la tabla.
+
+        Argumentos:
+            :address: La dirección del nodo.
+        """
+        peer = self.__peers.get(address)
+        if peer is None:
+            return False
+        now = self.__clock()
+        peer.failures += 1
+        peer.total_failures += 1
+        peer.next_retry = now + min(MAX_BACKOFF,
+                                    BASE_BACKOFF * 2 ** (peer.failures - 1))
+        alive_at = peer.last_seen if peer.last_seen is not None else peer.added_at
+        if peer.failures >= EVICT_AFTER_FAILURES and now - alive_at >= EVICT_AFTER_SECONDS:
+            del self.__peers[address]
+            return True
+        return False
+
+    def health(self):
+        """Devuelve el estado de todos los nodos como una lista de diccionarios."""
+        now = self.__clock()
+        health = []
+        for peer in self.__peers.values():
+            peer_health = peer.__dict__.copy()
+            peer_health['backing_off'] = peer.next_retry > now
+            health.append(peer_health)
+        return health
@@ -0,0 +1,101 @@
+"""Proporciona una caché de respuestas de los endpoints de lectura."""
+
+from collections import OrderedDict
+import threading
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas ya serializadas, indexada por ruta, parámetros y versión del
+    estado de la blockchain. Cuando cambia la versión, todas las entradas anteriores dejan de
+    ser válidas y se descartan; además, se expulsan las menos usadas si se supera el número
+    máximo de entradas o de bytes.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__version = None
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        """
+        Devuelve la respuesta guardada para una clave y versión (o None si no está).
+
+        Argumentos:
+            :key: La clave de la petición (ruta y parámetros).
+            :version: La versión actual del estado (un entero creciente).
+        """
+        with self.__lock:
+            self.__check_version(version)
+            entry = self.__entries.get(key) if version == self.__version else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, status, headers):
+        """
+        Guarda una respuesta serializada.
+
+        Argumentos:
+            :key: La clave de la petición (ruta y parámetros).
+            :version: La versión del estado con la que se ha calculado la respuesta.
+            :body: El cuerpo de la respuesta (bytes).
+            :status: El código de estado.
+            :headers: Lista de pares (cabecera, valor).
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self.__lock:
+            # Una respuesta calculada con una versión ya superada no se guarda
+            if version != self.__version:
+                return
+            previous = self.__entries.pop(key, None)
+            if previous is not None:
+                self.__bytes -= len(previous[0])
+            self.__entries[key] = (body, status, headers)
+            self.__bytes += len(body)
+            while len(self.__entries) > self.max_entries or self.__bytes > self.max_bytes:
+                _, (evicted_body, _, _) = self.__entries.popitem(last=False)
+                self.__bytes -= len(evicted_body)
+                self.evictions += 1
+
+    def clear(self):
+        """Descarta todas las entradas."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            self.__version = None
+
+    def __check_version(self, version):
+        # Sólo se conserva la versión más reciente (las versiones siempre crecen): al llegar
+        # una nueva, el resto de entradas están obsoletas
+        if self.__version is None or version > self.__version:
+            if self.__entries:
+                self.invalidations += 1
+            self.__entries.clear()
+            self.__bytes = 0
+            self.__version = version
+
+    def stats(self):
+        """Devuelve las estadísticas de uso de la caché."""
+        with self.__lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / float(requests) if requests else 0.0,
+                'entries': len(self.__entries),
+                'bytes': self.__bytes,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,36 @@
+"""Proporciona una caché acotada de identificadores de mensajes ya vistos."""
+
+from collections import OrderedDict
+
+
+class SeenCache:
+    """
+    Recuerda los últimos identificadores (hashes de transacciones o bloques) procesados
+    para descartar los duplicados que llegan por varios caminos en la difusión gossip.
+    Cuando se llena, olvida los identificadores más antiguos.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.__ids = OrderedDict()
+
+    def __contains__(self, message_id):
+        return message_id in self.__ids
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def add(self, message_id):
+        """
+        Marca un identificador como visto. Devuelve True si no se había visto antes.
+
+        Argumentos:
+            :message_id: El identificador del mensaje.
+        """
+        if message_id in self.__ids:
+            self.__ids.move_to_end(message_id)
+            return False
+        self.__ids[message_id] = True
+        if len(self.__ids) > self.max_size:
+            self.__ids.popitem(last=False)
+        return True
@@ -0,0 +1,152 @@
+"""
+Proporciona los esquemas de firma con los que se crean las claves de los monederos y se
+firman y verifican las transacciones.
+
+Cada transacción indica el esquema con el que se ha firmado ('rsa' por defecto, el de las
+transacciones anteriores a la existencia de los esquemas). Las claves públicas ya
+interpretadas se guardan en una caché, porque un mismo remitente firma muchas transacciones
+y cargar su clave cuesta más que la propia verificación.
+"""
+
+import binascii
+from functools import lru_cache
+
+from Crypto.PublicKey import RSA
+from Crypto.Signature import PKCS1_v1_5
+from Crypto.Hash import SHA256
+import Crypto.Random
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+        Ed25519PrivateKey, Ed25519PublicKey)
+except ImportError:
+    Ed25519PrivateKey = None
+
+# Esquema de las transacciones que no indican ninguno
+DEFAULT_SCHEME = 'rsa'
+# Número de claves públicas interpretadas que se conservan por esquema
+KEY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _rsa_verifier(public_key):
+    return PKCS1_v1_5.new(RSA.importKey(binascii.unhexlify(public_key)))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _ed25519_public_key(public_key):
+    return Ed25519PublicKey.from_public_bytes(binascii.unhexlify(public_key))
+
+
+class RsaScheme:
+    """Firmas PKCS#1 v1.5 con claves RSA de 1024 bits (codificadas en DER y hexadecimal)."""
+
+    name = 'rsa'
+
+    def generate_keys(self):
+        """Genera un nuevo par de claves y lo devuelve como (privada, pública) en hexadecimal."""
+        private_key = RSA.generate(1024, Crypto.Random.new().read)
+        public_key = private_key.publickey()
+        return (binascii
+                .hexlify(private_key.exportKey(format='DER'))
+                .decode('ascii'),
+                binascii
+                .hexlify(public_key.exportKey(format='DER'))
+                .decode('ascii'))
+
+    def sign(self, private_key, message):
+        """
+        Firma un mensaje y devuelve la firma en hexadecimal.
+
+        Argumentos:
+            :private_key: La clave privada en hexadecimal.
+            :message: El mensaje (bytes).
+        """
+        signer = PKCS1_v1_5.new(RSA.importKey(binascii.unhexlify(private_key)))
+        return binascii.hexlify(signer.sign(SHA256.new(message))).decode('ascii')
+
+    def verify(self, public_key, message, signature):
+        """
+        Comprueba la firma de un mensaje. Las claves o firmas mal formadas no son válidas.
+
+        Argumentos:
+            :public_key: La clave pública en hexadecimal.
+            :message: El mensaje (bytes).
+            :signature: La firma en hexadecimal.
+        """
+        try:
+            return _rsa_verifier(public_key).verify(
+                SHA256.new(message), binascii.unhexlify(signature))
+        except (ValueError, TypeError, IndexError):
+            return False
+
+
+class Ed25519Scheme:
+    """Firmas Ed25519 (claves de 32 bytes y firmas de 64 bytes, en hexadecimal)."""
+
+    name = 'ed25519'
+
+    def generate_keys(self):
+        """Genera un nuevo par de claves y lo devuelve como (privada, pública) en hexadecimal."""
+        private_key = Ed25519PrivateKey.generate()
+        private_bytes = private_key.private_bytes(
+            serialization.Encoding.Raw, serialization.PrivateFormat.Raw,
+            serialization.NoEncryption())
+        public_bytes = private_key.public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return (binascii.hexlify(private_bytes).decode('ascii'),
+                binascii.hexlify(public_bytes).decode('ascii'))
+
+    def sign(self, private_key, message):
+        """
+        Firma un mensaje y devuelve la firma en hexadecimal.
+
+        Argumentos:
+            :private_key: La clave privada en hexadecimal.
+            :message: El mensaje (bytes).
+        """
+        signer = Ed25519PrivateKey.from_private_bytes(binascii.unhexlify(private_key))
+        return binascii.hexlify(signer.sign(message)).decode('ascii')
+
+    def verify(self, public_key, message, signature):
+        """
+        Comprueba la firma de un mensaje. Las claves o firmas mal formadas no son válidas.
+
+        Argumentos:
+            :public_key: La clave pública en hexadecimal.
+            :message: El mensaje (bytes).
+            :signature: La firma en hexadecimal.
+        """
+        try:
+            _ed25519_public_key(public_key).verify(
+                binascii.unhexlify(signature), message)
+            return True
+        except (InvalidSignature, ValueError, TypeError):
+            return False
+
+
+SCHEMES = {RsaScheme.name: RsaScheme()}
+# Ed25519 requiere el paquete cryptography
+if Ed25519PrivateKey is not None:
+    SCHEMES[Ed25519Scheme.name] = Ed25519Scheme()
+
+
+def clear_key_cache():
+    """Vacía la caché de claves públicas interpretadas de todos los esquemas."""
+    _rsa_verifier.cache_clear()
+    _ed25519_public_key.cache_clear()
+
+
+def get_scheme(name):
+    """
+    Devuelve el esquema de firma con el nombre dado.
+
+    Argumentos:
+        :name: El nombre del esquema ('rsa' o 'ed25519').
+    """
+    try:
+        return SCHEMES[name]
+    except KeyError:
+        raise ValueError('Unknown signature scheme: {}'.format(name))
@@ -0,0 +1,82 @@
+"""Proporciona las instantáneas del estado derivado de la cadena (saldos a una altura dada)."""
+
+import json
+import os
+
+from utility.hash_util import hash_string_256
+
+
+def snapshot_commitment(height, block_hash, balances):
+    """
+    Calcula el compromiso (hash) de una instantánea a partir de su contenido.
+
+    Argumentos:
+        :height: La altura del bloque de la instantánea.
+        :block_hash: El hash del bloque a esa altura.
+        :balances: Diccionario con el saldo de cada dirección a esa altura.
+    """
+    content = {'height': height, 'block_hash': block_hash, 'balances': balances}
+    return hash_string_256(json.dumps(content, sort_keys=True).encode())
+
+
+def build_snapshot(height, block_hash, balances):
+    """
+    Crea una instantánea de los saldos a una altura dada, comprometida con su hash.
+
+    Argumentos:
+        :height: La altura del bloque de la instantánea.
+        :block_hash: El hash del bloque a esa altura.
+        :balances: Diccionario con el saldo de cada dirección a esa altura.
+    """
+    return {
+        'height': height,
+        'block_hash': block_hash,
+        'balances': balances,
+        'commitment': snapshot_commitment(height, block_hash, balances)
+    }
+
+
+def verify_snapshot(snapshot):
+    """
+    Comprueba que una instantánea está completa y que su compromiso corresponde a su contenido.
+
+    El compromiso lo calcula la propia instantánea, así que sólo detecta datos corruptos o
+    incompletos: quien la envía puede falsear los saldos y recalcularlo. La confianza en los
+    saldos llega al verificar el historial completo (Blockchain.verify_history).
+
+    Argumentos:
+        :snapshot: La instantánea (un diccionario).
+    """
+    try:
+        return snapshot['commitment'] == snapshot_commitment(
+            snapshot['height'], snapshot['block_hash'], snapshot['balances'])
+    except (KeyError, TypeError):
+        return False
+
+
+def save_snapshot(snapshot, node_id):
+    """Guarda una instantánea en el archivo snapshot-<node_id>.json."""
+    try:
+        with open('snapshot-{}.json'.format(node_id), mode='w') as f:
+            f.write(json.dumps(snapshot))
+        return True
+    except IOError:
+        print('Fallo al guardar la instantánea!')
+        return False
+
+
+def remove_snapshot(node_id):
+    """Borra la instantánea guardada por el nodo (si existe)."""
+    try:
+        os.remove('snapshot-{}.json'.format(node_id))
+    except OSError:
+        pass
+
+
+def load_snapshot(node_id):
+    """Carga la última instantánea guardada por el nodo o devuelve None si no existe."""
+    try:
+        with open('snapshot-{}.json'.format(node_id), mode='r') as f:
+            return json.loads(f.read())
+    except (IOError, ValueError):
+        return None
@@ -0,0 +1,43 @@
+"""Proporciona el transporte con el que un nodo se comunica con sus homólogos."""
+
+from time import time
+
+import requests
+
+
+class HttpTransport:
+    """
+    Transporte por defecto: envía las peticiones a los nodos homólogos mediante HTTP.
+
+    La blockchain no llama directamente a la librería requests, sino a este objeto, de forma
+    que se pueda sustituir (por ejemplo, por el transporte en memoria del simulador de red).
+    """
+
+    def post(self, node, path, payload, timeout=None):
+        """
+        Envía una petición POST con datos JSON a un nodo homólogo.
+
+        Argumentos:
+            :node: La URL (host:puerto) del nodo de destino.
+            :path: La ruta del endpoint (sin la barra inicial).
+            :payload: Los datos que se envían como JSON.
+            :timeout: Tiempo máximo de espera en segundos (opcional).
+        """
+        url = 'http://{}/{}'.format(node, path)
+        return requests.post(url, json=payload, timeout=timeout)
+
+    def get(self, node, path, timeout=None):
+        """
+        Envía una petición GET a un nodo homólogo.
+
+        Argumentos:
+            :node: La URL (host:puerto) del nodo de destino.
+            :path: La ruta del endpoint (sin la barra inicial).
+            :timeout: Tiempo máximo de espera en segundos (opcional).
+        """
+        url = 'http://{}/{}'.format(node, path)
+        return requests.get(url, timeout=timeout)
+
+    def now(self):
+        """Devuelve la hora actual (en segundos) según este transporte."""
+        return time()
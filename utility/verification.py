@@ -1,6 +1,7 @@
 """Proporciona métodos de ayuda a la verificación."""
 
 from utility.hash_util import hash_string_256, hash_block
+from utility.difficulty import DifficultyPolicy, INITIAL_DIFFICULTY, MAX_FUTURE_BLOCK_TIME
 from wallet import Wallet
 
 
@@ -10,15 +11,16 @@ class Verification:
     estáticos y basados en clases y validación basados en clases.
     """
     @staticmethod
-    def valid_proof(transactions, last_hash, proof):
+    def valid_proof(transactions, last_hash, proof, difficulty=INITIAL_DIFFICULTY):
         """
         Validar un número de prueba de trabajo y ver si resuelve el algoritmo de
-        prueba (dos ceros a la izquierda)
+        prueba (un hash menor que 2^256 / dificultad)
 
         Arguments:
             :transactions: Las transacciones del bloque para el que se crea la prueba.
             :last_hash: El hash del bloque anterior que se almacenará en el bloque actual.
             :proof: El número de prueba que estamos probando.
+            :difficulty: La dificultad del bloque (la inicial equivale a dos ceros a la izquierda).
         """
         # Crear una cadena con todas las entradas hash
         guess = (str([tx.to_ordered_dict() for tx in transactions]) +
@@ -27,24 +29,63 @@ class Verification:
         # IMPORTANTE: Este NO es el mismo hash que se almacenará en previous_hash.
         # No es el hash de un bloque. Sólo se utiliza para el algoritmo de Proof of Work
         guess_hash = hash_string_256(guess)
-        # Sólo un hash (que se basa en las entradas anteriores)
-        # que empiece por dos 0 se considera válido
-        # Por supuesto, se puede redefinir esta condición. También se podrían exigir 10
-        # ceros a la izquierda, lo que llevaría bastante más tiempo (esto además permitiría
-        # controlar la velocidad a la que se pueden añadir nuevos bloques).
-        return guess_hash[0:2] == '00'
+        # Sólo un hash (que se basa en las entradas anteriores) menor que el objetivo se
+        # considera válido: de media hacen falta tantos intentos como indica la dificultad,
+        # que se ajusta para controlar la velocidad a la que se añaden nuevos bloques
+        return int(guess_hash, 16) < 2 ** 256 // difficulty
 
     @classmethod
-    def verify_chain(cls, blockchain):
+    def verify_chain(cls, blockchain, policy=None, start=0, now=None):
         """
         Verifica la blockchain actual y devuelve True si es válida, False en caso contrario.
+
+        Los bloques hasta la posición start (incluida) son contexto ya verificado (por ejemplo,
+        la parte común con la cadena local): sólo se comprueban sus enlaces y sirven para
+        calcular la dificultad esperada de los bloques siguientes. Los bloques sin dificultad
+        (anteriores a guardarla en la cabecera) sólo se admiten al principio de la cadena.
+        Si se indica la hora actual, se rechazan los bloques cuya marca de tiempo se adelanta
+        más de MAX_FUTURE_BLOCK_TIME (como en los bloques recibidos uno a uno): si no, unas
+        marcas de tiempo en el futuro rebajarían la dificultad en cada ajuste.
+
+        Arguments:
+            :blockchain: La lista de bloques.
+            :policy: La regla de ajuste de la dificultad (por defecto, la estándar).
+            :start: La posición del último bloque de contexto.
+            :now: La hora actual según el reloj del nodo (None para no comprobarla).
         """
+        if policy is None:
+            policy = DifficultyPolicy()
         for (index, block) in enumerate(blockchain):
             if index == 0:
                 continue
             if block.previous_hash != hash_block(blockchain[index - 1]):
                 return False
-            if not cls.valid_proof(block.transactions[:-1], block.previous_hash, block.proof):
+            if index <= start:
+                continue
+            # Sólo los bloques de contexto pueden estar podados
+            if getattr(block, 'pruned', False):
+                return False
+            if now is not None and block.timestamp > now + MAX_FUTURE_BLOCK_TIME:
+                print('Marca de tiempo en el futuro')
+                return False
+            if block.difficulty is None:
+                # Bloque anterior a guardar la dificultad: sin ajuste ni regla de la mediana
+                if not policy.valid_legacy_block(blockchain, index):
+                    print('Bloque sin dificultad no válido')
+                    return False
+                if not cls.valid_proof(block.transactions[:-1], block.previous_hash,
+                                       block.proof, INITIAL_DIFFICULTY):
+                    print('Proof of work no válido')
+                    return False
+                continue
+            if block.difficulty != policy.next_difficulty(blockchain, index):
+                print('Dificultad no válida')
+                return False
+            if not policy.valid_timestamp(blockchain, index):
+                print('Marca de tiempo no válida')
+                return False
+            if not cls.valid_proof(block.transactions[:-1], block.previous_hash, block.proof,
+                                   block.difficulty):
                 print('Proof of work no válido')
                 return False
         return True
@@ -67,8 +108,7 @@ class Verification:
     @classmethod
     def verify_transactions(cls, open_transactions, get_balance):
         """
-        Verifica todas las transacciones pendientes.
+        Verifica las firmas de todas las transacciones pendientes.
         """
-        return all([cls.verify_transaction(tx, get_balance, False) 
-                    for tx in open_transactions])
+        return all(Wallet.verify_transactions(open_transactions))
         
\ No newline at end of file
@@ -1,20 +1,21 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
-from Crypto.Hash import SHA256
-import Crypto.Random
-import binascii
+from utility.signature_schemes import DEFAULT_SCHEME, SCHEMES, get_scheme
 
 
 class Wallet:
     """
     Crea, carga y conserva claves privadas y públicas. Gestiona la firma y
     verificación de transacciones.
+
+    Atributos:
+        :scheme: El esquema de firma de las claves del monedero ('rsa' o 'ed25519').
     """
 
-    def __init__(self, node_id):
+    def __init__(self, node_id, scheme=DEFAULT_SCHEME):
         self.private_key = None
         self.public_key = None
         self.node_id = node_id
+        get_scheme(scheme)
+        self.scheme = scheme
 
     def create_keys(self):
         """Crear un nuevo par de claves privada y pública."""
@@ -30,6 +31,8 @@ class Wallet:
                     f.write(self.public_key)
                     f.write('\n')
                     f.write(self.private_key)
+                    f.write('\n')
+                    f.write(self.scheme)
                 return True
             except (IOError, IndexError):
                 print('Error al guardar el monedero...')
@@ -41,24 +44,26 @@ class Wallet:
             with open('wallet-{}.txt'.format(self.node_id), mode='r') as f:
                 keys = f.readlines()
                 public_key = keys[0][:-1]
-                private_key = keys[1]
+                private_key = keys[1].rstrip('\n')
+                # Los monederos guardados antes de los esquemas de firma son RSA
+                scheme = keys[2] if len(keys) > 2 else DEFAULT_SCHEME
+                get_scheme(scheme)
                 self.public_key = public_key
                 self.private_key = private_key
+                self.scheme = scheme
             return True
-        except (IOError, IndexError):
+        except (IOError, IndexError, ValueError):
             print('Error al cargar el monedero...')
             return False
 
     def generate_keys(self):
-        """Generar un nuevo par de claves privada y pública."""
-        private_key = RSA.generate(1024, Crypto.Random.new().read)
-        public_key = private_key.publickey()
-        return (binascii
-                .hexlify(private_key.exportKey(format='DER'))
-                .decode('ascii'),
-                binascii
-                .hexlify(public_key.exportKey(format='DER'))
-                .decode('ascii'))
+        """Generar un nuevo par de claves privada y pública con el esquema del monedero."""
+        return get_scheme(self.scheme).generate_keys()
+
+    @staticmethod
+    def transaction_message(sender, recipient, amount):
+        """Devuelve el mensaje (bytes) que se firma para una transacción."""
+        return (str(sender) + str(recipient) + str(amount)).encode('utf8')
 
     def sign_transaction(self, sender, recipient, amount):
         """Firmar una transacción y devolver la firma.
@@ -68,22 +73,30 @@ class Wallet:
             :recipient: El destinatario de la transacción.
             :amount: El importe de la transacción.
         """
-        signer = PKCS1_v1_5.new(RSA.importKey(
-            binascii.unhexlify(self.private_key)))
-        h = SHA256.new((str(sender) + str(recipient) +
-                       str(amount)).encode('utf8'))
-        signature = signer.sign(h)
-        return binascii.hexlify(signature).decode('ascii')
+        return get_scheme(self.scheme).sign(
+            self.private_key, Wallet.transaction_message(sender, recipient, amount))
 
     @staticmethod
     def verify_transaction(transaction):
-        """Verificar la firma de una transacción.
+        """Verificar la firma de una transacción con el esquema que indica la transacción.
 
         Arguments:
             :transaction: La transacción que debe verificarse.
         """
-        public_key = RSA.importKey(binascii.unhexlify(transaction.sender))
-        verifier = PKCS1_v1_5.new(public_key)
-        h = SHA256.new((str(transaction.sender) + str(transaction.recipient) +
-                       str(transaction.amount)).encode('utf8'))
-        return verifier.verify(h, binascii.unhexlify(transaction.signature))
+        scheme = SCHEMES.get(transaction.scheme)
+        if scheme is None:
+            return False
+        return scheme.verify(transaction.sender, Wallet.transaction_message(
+            transaction.sender, transaction.recipient, transaction.amount),
+            transaction.signature)
+
+    @staticmethod
+    def verify_transactions(transactions):
+        """Verificar las firmas de varias transacciones y devolver una lista de resultados
+        (en el mismo orden). Cada firma se comprueba por separado; la clave pública de cada
+        remitente sólo se interpreta la primera vez (caché de los esquemas de firma).
+
+        Arguments:
+            :transactions: Las transacciones que deben verificarse.
+        """
+        return [Wallet.verify_transaction(tx) for tx in transactions]